@@ -5,16 +5,88 @@ const API_BASE_URL = 'http://localhost:8000';
 export interface UploadResponse {
   message: string;
   chunk_count: number;
+  total_chunk_count: number;
   session_id: string;
   documents: Array<{
     name: string;
     size: number;
     upload_date: string;
   }>;
+  all_documents: Array<{
+    name: string;
+    size: number;
+    upload_date: string;
+  }>;
+}
+
+export interface IngestJobAccepted {
+  message: string;
+  job_id: string;
+  session_id: string;
+  status_url: string;
+}
+
+export interface IngestJobStatus {
+  job_id: string;
+  session_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  stage: 'queued' | 'extracting' | 'chunking' | 'embedding' | 'indexing' | 'completed' | 'failed';
+  document_count: number;
+  pages_processed: number;
+  chunk_count: number;
+  chunks_embedded: number;
+  error: string | null;
+  result: UploadResponse | null;
+}
+
+export interface ChatSource {
+  rank: number;
+  session_id: string;
+  preview: string;
+  metadata: Record<string, unknown>;
 }
 
 export interface ChatResponse {
   answer: string;
+  sources: ChatSource[];
+  session_ids: string[];
+  cached: boolean;
+  cache_match: 'exact' | 'semantic' | null;
+}
+
+export interface BatchAnswer {
+  index: number;
+  question: string;
+  answer: string | null;
+  sources: ChatSource[];
+  cached: boolean;
+  cache_match: 'exact' | 'semantic' | null;
+  error: string | null;
+  llm_seconds: number;
+  elapsed_seconds: number;
+}
+
+export interface BatchResponse {
+  session_ids: string[];
+  results: BatchAnswer[];
+  answered: number;
+  failed: number;
+  cached: number;
+  timings: {
+    embed_seconds: number;
+    retrieval_seconds: number;
+    prepare_seconds: number;
+    total_seconds: number;
+  };
+}
+
+export interface ChatStreamResult {
+  answer: string;
+  session_id: string;
+  session_ids: string[];
+  sources: ChatSource[];
+  cached: boolean;
+  cache_match: 'exact' | 'semantic' | null;
 }
 
 export interface SessionInfo {
@@ -31,10 +103,28 @@ export interface SessionInfo {
 export interface SessionSummary {
   session_id: string;
   created_at: string;
+  updated_at: string;
   document_count: number;
   chunk_count: number;
 }
 
+export interface SessionList {
+  sessions: SessionSummary[];
+  total: number;
+  limit: number;
+  offset: number;
+}
+
+export interface ListSessionsOptions {
+  limit?: number;
+  offset?: number;
+  sort?: 'created_at' | 'updated_at' | 'document_count' | 'chunk_count';
+  order?: 'asc' | 'desc';
+  name?: string;
+  createdAfter?: string;
+  createdBefore?: string;
+}
+
 export class PDFApiError extends Error {
   constructor(message: string, public status?: number) {
     super(message);
@@ -42,7 +132,56 @@ export class PDFApiError extends Error {
   }
 }
 
-export async function uploadPDFs(files: File[], sessionId?: string): Promise<UploadResponse> {
+const JOB_POLL_INTERVAL_MS = 1000;
+
+export async function getJobStatus(jobId: string): Promise<IngestJobStatus> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+
+    if (!response.ok) {
+      throw new PDFApiError(
+        `Job not found: ${jobId}`,
+        response.status
+      );
+    }
+
+    return await response.json();
+  } catch (error) {
+    if (error instanceof PDFApiError) {
+      throw error;
+    }
+    throw new PDFApiError(
+      error instanceof Error ? error.message : 'Failed to get job status'
+    );
+  }
+}
+
+// Polls an ingestion job until it finishes and returns its result
+export async function waitForJob(
+  jobId: string,
+  onProgress?: (status: IngestJobStatus) => void
+): Promise<UploadResponse> {
+  while (true) {
+    const status = await getJobStatus(jobId);
+    onProgress?.(status);
+
+    if (status.status === 'completed' && status.result) {
+      return status.result;
+    }
+    if (status.status === 'failed') {
+      throw new PDFApiError(status.error || 'Upload processing failed');
+    }
+
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+}
+
+export async function uploadPDFs(
+  files: File[],
+  sessionId?: string,
+  onProgress?: (status: IngestJobStatus) => void,
+  mode: 'append' | 'replace' = 'append'
+): Promise<UploadResponse> {
   const formData = new FormData();
   
   // Add all files to the form data
@@ -50,9 +189,10 @@ export async function uploadPDFs(files: File[], sessionId?: string): Promise<Upl
     formData.append('files', file);
   });
   
-  // Add session ID if provided
+  // Add session ID if provided; new files are appended to its index unless mode is 'replace'
   if (sessionId) {
     formData.append('session_id', sessionId);
+    formData.append('mode', mode);
   }
 
   try {
@@ -69,7 +209,8 @@ export async function uploadPDFs(files: File[], sessionId?: string): Promise<Upl
       );
     }
 
-    return await response.json();
+    const accepted: IngestJobAccepted = await response.json();
+    return await waitForJob(accepted.job_id, onProgress);
   } catch (error) {
     if (error instanceof PDFApiError) {
       throw error;
@@ -80,10 +221,16 @@ export async function uploadPDFs(files: File[], sessionId?: string): Promise<Upl
   }
 }
 
-export async function chatWithPDF(question: string, sessionId: string): Promise<ChatResponse> {
+// Adds the session(s) to search; several sessions are queried together and their results merged
+function appendSessionIds(formData: FormData, sessionId: string | string[]) {
+  const ids = Array.isArray(sessionId) ? sessionId : [sessionId];
+  ids.forEach((id) => formData.append('session_ids', id));
+}
+
+export async function chatWithPDF(question: string, sessionId: string | string[]): Promise<ChatResponse> {
   const formData = new FormData();
   formData.append('question', question);
-  formData.append('session_id', sessionId);
+  appendSessionIds(formData, sessionId);
 
   try {
     const response = await fetch(`${API_BASE_URL}/chat`, {
@@ -110,6 +257,118 @@ export async function chatWithPDF(question: string, sessionId: string): Promise<
   }
 }
 
+// Answers many questions in one request; per-question failures are reported in results[i].error
+export async function chatBatch(questions: string[], sessionId: string | string[]): Promise<BatchResponse> {
+  const formData = new FormData();
+  questions.forEach((question) => formData.append('questions', question));
+  appendSessionIds(formData, sessionId);
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/chat/batch`, {
+      method: 'POST',
+      body: formData,
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new PDFApiError(
+        errorData.detail || `Batch chat failed with status ${response.status}`,
+        response.status
+      );
+    }
+
+    return await response.json();
+  } catch (error) {
+    if (error instanceof PDFApiError) {
+      throw error;
+    }
+    throw new PDFApiError(
+      error instanceof Error ? error.message : 'Batch chat request failed'
+    );
+  }
+}
+
+// Streams the answer over Server-Sent Events, calling onToken as text arrives
+export async function chatWithPDFStream(
+  question: string,
+  sessionId: string | string[],
+  onToken: (text: string) => void
+): Promise<ChatStreamResult> {
+  const formData = new FormData();
+  formData.append('question', question);
+  appendSessionIds(formData, sessionId);
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+      method: 'POST',
+      body: formData,
+    });
+
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new PDFApiError(
+        errorData.detail || `Chat failed with status ${response.status}`,
+        response.status
+      );
+    }
+
+    const result: ChatStreamResult = {
+      answer: '',
+      session_id: Array.isArray(sessionId) ? sessionId[0] : sessionId,
+      session_ids: Array.isArray(sessionId) ? sessionId : [sessionId],
+      sources: [],
+      cached: false,
+      cache_match: null,
+    };
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const payload = data ? JSON.parse(data) : {};
+
+        if (event === 'token') {
+          result.answer += payload.text;
+          onToken(payload.text);
+        } else if (event === 'sources') {
+          result.session_id = payload.session_id;
+          result.session_ids = payload.session_ids;
+          result.sources = payload.sources;
+          result.cached = payload.cached;
+          result.cache_match = payload.cache_match;
+        } else if (event === 'error') {
+          throw new PDFApiError(payload.detail || 'Chat stream failed');
+        }
+      }
+    }
+
+    return result;
+  } catch (error) {
+    if (error instanceof PDFApiError) {
+      throw error;
+    }
+    throw new PDFApiError(
+      error instanceof Error ? error.message : 'Chat request failed'
+    );
+  }
+}
+
 export async function getSessionInfo(sessionId: string): Promise<SessionInfo> {
   try {
     const response = await fetch(`${API_BASE_URL}/sessions/${sessionId}`);
@@ -132,9 +391,19 @@ export async function getSessionInfo(sessionId: string): Promise<SessionInfo> {
   }
 }
 
-export async function listSessions(): Promise<{ sessions: SessionSummary[] }> {
+export async function listSessions(options: ListSessionsOptions = {}): Promise<SessionList> {
   try {
-    const response = await fetch(`${API_BASE_URL}/sessions`);
+    const params = new URLSearchParams();
+    if (options.limit !== undefined) params.set('limit', String(options.limit));
+    if (options.offset !== undefined) params.set('offset', String(options.offset));
+    if (options.sort) params.set('sort', options.sort);
+    if (options.order) params.set('order', options.order);
+    if (options.name) params.set('name', options.name);
+    if (options.createdAfter) params.set('created_after', options.createdAfter);
+    if (options.createdBefore) params.set('created_before', options.createdBefore);
+    const query = params.toString();
+
+    const response = await fetch(`${API_BASE_URL}/sessions${query ? `?${query}` : ''}`);
     
     if (!response.ok) {
       throw new PDFApiError(
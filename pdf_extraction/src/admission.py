@@ -0,0 +1,107 @@
+"""
+Admission control for blocking request handlers
+
+Limits how many requests run at once, lets a bounded number wait for a slot
+for a bounded time, and rejects the rest immediately with a Retry-After hint
+derived from recent service times. Admitted work runs on a dedicated thread
+pool so the event loop stays free while the LLM round trip is in progress.
+"""
+
+import asyncio
+import contextvars
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status to send."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight work plus a bounded, time-limited wait queue."""
+
+    def __init__(self, name: str, max_in_flight: int = 8, max_queue: int = 32, queue_timeout: float = 10.0):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._in_flight = 0
+        self._queued = 0
+        # Exponentially weighted mean service time, used for Retry-After
+        self._avg_service = 1.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def retry_after(self) -> int:
+        waves = (self._queued + self._in_flight) / self.max_in_flight
+        return max(1, math.ceil(waves * self._avg_service))
+
+    async def acquire(self) -> float:
+        """Wait for a slot or raise Overloaded; returns the start time to pass to release()."""
+        if self._in_flight + self._queued >= self.max_in_flight + self.max_queue:
+            self.rejected += 1
+            raise Overloaded(429, f"Too many concurrent {self.name} requests", self.retry_after())
+
+        self._queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(503, f"Timed out waiting for a free {self.name} slot", self.retry_after())
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        self.admitted += 1
+        return time.monotonic()
+
+    def release(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        self._avg_service = 0.8 * self._avg_service + 0.2 * elapsed
+        self._in_flight -= 1
+        self._slots.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        started = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Admit the request, then run ``func(*args)`` on the controller's thread pool.
+
+        ``func`` runs in a copy of the caller's context, so per-request state kept in
+        context variables (e.g. stage timings) is visible to it.
+        """
+        async with self.slot():
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(self.executor, context.run, func, *args)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_seconds": round(self._avg_service, 3),
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,174 @@
+"""
+Answer cache
+
+Remembers generated answers per session so a repeated question skips retrieval
+and the LLM call. Lookups match the normalized question text exactly. An
+optional, opt-in fallback compares the question's embedding with those of
+questions already answered in the same session, so paraphrases hit too; each
+session's question vectors are kept as one matrix and scored with a single
+product, outside the cache lock. Entries expire
+after a TTL, the cache is LRU-bounded, and every entry is tied to the version
+of the session index it was answered from.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _WHITESPACE.sub(" ", question).strip().rstrip("?.! ").lower()
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else array
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers keyed by (session id, normalized question)."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, similarity_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # 0 disables the similarity fallback
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._by_session: Dict[str, Set[Tuple[str, str]]] = {}
+        # Per session: keys, entries and the stacked unit question vectors, rebuilt after changes
+        self._matrices: Dict[str, Tuple[List[Tuple[str, str]], List[Dict[str, Any]], np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def _usable_locked(self, key: Tuple[str, str], entry: Dict[str, Any], version: Any) -> bool:
+        if entry["expires_at"] < time.time() or entry["version"] != version:
+            self._remove_locked(key)
+            return False
+        return True
+
+    def get_exact(self, session_id: str, question: str, version: Any) -> Optional[Dict[str, Any]]:
+        key = (session_id, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._usable_locked(key, entry, version):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry
+            if not self.semantic_enabled:
+                self.misses += 1
+            return None
+
+    def _matrix_locked(self, session_id: str):
+        matrix = self._matrices.get(session_id)
+        if matrix is None:
+            keys, entries = [], []
+            for key in self._by_session.get(session_id, ()):
+                entry = self._entries[key]
+                if entry["unit"] is not None:
+                    keys.append(key)
+                    entries.append(entry)
+            if not entries:
+                return None
+            matrix = (keys, entries, np.stack([entry["unit"] for entry in entries]))
+            self._matrices[session_id] = matrix
+        return matrix
+
+    def get_similar(self, session_id: str, vector: List[float], version: Any) -> Optional[Dict[str, Any]]:
+        """Best cached answer in the session whose question is at least ``similarity_threshold`` similar."""
+        with self._lock:
+            matrix = self._matrix_locked(session_id)
+        candidates: List[int] = []
+        if matrix is not None:
+            keys, entries, vectors = matrix
+            scores = vectors @ _unit(vector)
+            candidates = [int(i) for i in np.argsort(-scores) if scores[i] >= self.similarity_threshold]
+        with self._lock:
+            for i in candidates:
+                key = keys[i]
+                entry = self._entries.get(key)
+                # Skip entries replaced or removed since the matrix was read
+                if entry is not entries[i] or not self._usable_locked(key, entry, version):
+                    continue
+                self._entries.move_to_end(key)
+                self.semantic_hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        session_id: str,
+        question: str,
+        version: Any,
+        answer: str,
+        sources: List[Dict[str, Any]],
+        vector: Optional[List[float]] = None,
+    ) -> None:
+        key = (session_id, normalize_question(question))
+        entry = {
+            "answer": answer,
+            "sources": sources,
+            "version": version,
+            "vector": vector,
+            "unit": _unit(vector) if vector is not None else None,
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._by_session.setdefault(session_id, set()).add(key)
+            self._matrices.pop(session_id, None)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self.evictions += 1
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            keys = self._by_session.pop(session_id, set())
+            self._matrices.pop(session_id, None)
+            for key in keys:
+                self._entries.pop(key, None)
+            if keys:
+                self.invalidations += 1
+
+    def _remove_locked(self, key: Tuple[str, str]) -> None:
+        self._entries.pop(key, None)
+        self._matrices.pop(key[0], None)
+        keys = self._by_session.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_session[key[0]]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": (hits / lookups) if lookups else None,
+            }
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+PDF Chat API benchmark
+
+Generates synthetic PDFs of several sizes and measures the API end to end:
+ingestion throughput (pages/s and chunks/s from upload to completed job) and
+/chat latency percentiles at several concurrency levels. Results are written as
+JSON. Passing ``--baseline`` compares them with an earlier run and exits non-zero
+on a regression beyond ``--tolerance``.
+
+By default the script starts its own server in a temporary directory with the
+fake embedding and LLM backends (see model_backends.py), so it needs no API key
+and measures the service itself rather than the Google APIs. ``--url`` runs it
+against a server that is already running instead.
+
+    python benchmark.py --pages 10,100,500 --concurrency 1,8,32 --output results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# Synthetic documents: numbered facts built from a fixed vocabulary, so text,
+# chunk counts and retrieval results are the same on every run with the same seed
+_SUBJECTS = ["reactor", "turbine", "pipeline", "ledger", "cluster", "satellite", "catalog", "harbor", "archive", "sensor"]
+_VERBS = ["records", "reduces", "supplies", "monitors", "delays", "balances", "exports", "measures", "filters", "rotates"]
+_OBJECTS = ["pressure", "revenue", "latency", "inventory", "voltage", "traffic", "humidity", "throughput", "capacity", "demand"]
+_FILLER = ("according to the quarterly report the team observed that the value remained within the expected "
+           "range although several outliers were noted during maintenance windows and audits").split()
+
+
+def fact_sentence(rng: random.Random, number: int) -> str:
+    filler = " ".join(rng.sample(_FILLER, 12))
+    return (f"Fact {number}: the {rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} "
+            f"at {rng.randint(1, 999)} units, {filler}.")
+
+
+def generate_pdf(path: Path, pages: int, seed: int, facts_per_page: int = 12) -> int:
+    """Write a text PDF with ``pages`` pages; returns the number of facts in it."""
+    rng = random.Random(seed)
+    document = fitz.open()
+    number = 0
+    for page_number in range(pages):
+        page = document.new_page()
+        lines = [f"Synthetic benchmark document {seed}, page {page_number + 1}"]
+        for _ in range(facts_per_page):
+            number += 1
+            lines.append(fact_sentence(rng, number))
+        page.insert_textbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), "\n\n".join(lines), fontsize=9)
+    document.save(str(path))
+    document.close()
+    return number
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return round(ordered[rank], 4)
+
+
+class ApiClient:
+    """Minimal HTTP client (standard library only) for the endpoints the benchmark uses."""
+
+    def __init__(self, base_url: str, timeout: float = 600):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None, content_type: Optional[str] = None) -> Tuple[int, Any]:
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        try:
+            return status, json.loads(payload)
+        except ValueError:
+            return status, payload.decode("utf-8", "replace")
+
+    def post_form(self, path: str, fields: List[Tuple[str, str]], files: List[Tuple[str, str, bytes]] = ()) -> Tuple[int, Any]:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields:
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8"))
+        for name, filename, data in files:
+            parts.append(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                "Content-Type: application/pdf\r\n\r\n".encode("utf-8") + data + b"\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n".encode("utf-8"))
+        return self.request("POST", path, b"".join(parts), f"multipart/form-data; boundary={boundary}")
+
+    def get(self, path: str) -> Tuple[int, Any]:
+        return self.request("GET", path)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: Path, port: int, args) -> subprocess.Popen:
+    """Run the API with the fake backends; sessions, caches and jobs go to ``workdir``."""
+    env = {
+        **os.environ,
+        "PDF_CHAT_EMBEDDING_BACKEND": "fake",
+        "PDF_CHAT_LLM_BACKEND": "fake",
+        "PDF_CHAT_FAKE_EMBED_LATENCY": str(args.embed_latency),
+        "PDF_CHAT_FAKE_LLM_LATENCY": str(args.llm_latency),
+        "PDF_CHAT_FAKE_LLM_WORDS_PER_SECOND": str(args.llm_words_per_second),
+        # Uploads must be extracted, not looked up in real MinerU output
+        "PDF_CHAT_MINERU_OUTPUT_DIR": str(workdir / "mineru_output"),
+        "PDF_CHAT_LOG_SAMPLE_RATE": "0",
+    }
+    cmd = [
+        sys.executable, "-m", "uvicorn", "chat_with_pdf:app",
+        "--app-dir", str(SRC_DIR), "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=str(workdir), env=env)
+
+
+def wait_until_ready(client: ApiClient, server: Optional[subprocess.Popen], timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if client.get("/chat/stats")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def run_ingestion(client: ApiClient, pdf_path: Path, pages: int) -> Dict[str, Any]:
+    """Upload one PDF into a new session and wait for its ingestion job to finish."""
+    started = time.perf_counter()
+    status, body = client.post_form("/extract_pdf", [], [("files", pdf_path.name, pdf_path.read_bytes())])
+    if status != 202:
+        raise RuntimeError(f"Upload of {pdf_path.name} failed with {status}: {body}")
+    while True:
+        status, job = client.get(body["status_url"])
+        if status == 200 and job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.1)
+    seconds = time.perf_counter() - started
+    if job["status"] == "failed":
+        raise RuntimeError(f"Ingestion of {pdf_path.name} failed: {job['error']}")
+    return {
+        "pages": pages,
+        "file_bytes": pdf_path.stat().st_size,
+        "session_id": body["session_id"],
+        "chunks": job["chunk_count"],
+        "seconds": round(seconds, 4),
+        "pages_per_second": round(pages / seconds, 2),
+        "chunks_per_second": round(job["chunk_count"] / seconds, 2),
+    }
+
+
+def run_chat_load(client: ApiClient, session_id: str, concurrency: int, requests: int, fact_count: int, seed: int) -> Dict[str, Any]:
+    """Send ``requests`` distinct questions with ``concurrency`` in flight; report latency percentiles."""
+    rng = random.Random(seed)
+    # Distinct questions, so the answer cache does not turn the run into a cache benchmark
+    questions = [
+        f"What does fact {rng.randint(1, fact_count)} say about the {rng.choice(_SUBJECTS)} ({i})?"
+        for i in range(requests)
+    ]
+
+    def ask(question: str) -> Tuple[int, float, bool]:
+        started = time.perf_counter()
+        status, body = client.post_form("/chat", [("question", question), ("session_id", session_id)])
+        cached = status == 200 and isinstance(body, dict) and body.get("cached", False)
+        return status, time.perf_counter() - started, cached
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(ask, questions))
+    elapsed = time.perf_counter() - started
+
+    latencies = [seconds for status, seconds, _ in results if status == 200]
+    statuses: Dict[str, int] = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": len(latencies),
+        "cached": sum(1 for _, _, cached in results if cached),
+        "status_counts": statuses,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency_seconds": {
+            "mean": round(statistics.mean(latencies), 4) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+    }
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of more than ``tolerance`` (a fraction) against a previous results file."""
+    regressions = []
+    old_ingest = {run["pages"]: run for run in baseline.get("ingest", [])}
+    for run in results["ingest"]:
+        old = old_ingest.get(run["pages"])
+        if old and run["pages_per_second"] < old["pages_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"ingest {run['pages']} pages: {run['pages_per_second']} pages/s (baseline {old['pages_per_second']})"
+            )
+    old_chat = {run["concurrency"]: run for run in baseline.get("chat", [])}
+    for run in results["chat"]:
+        old = old_chat.get(run["concurrency"])
+        if not old:
+            continue
+        for q in ("p50", "p95", "p99"):
+            new_value, old_value = run["latency_seconds"][q], old["latency_seconds"][q]
+            if new_value is not None and old_value and new_value > old_value * (1 + tolerance):
+                regressions.append(f"chat concurrency {run['concurrency']}: {q} {new_value}s (baseline {old_value}s)")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=str(SRC_DIR), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark PDF ingestion and /chat latency")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one with fake backends")
+    parser.add_argument("--pages", type=parse_int_list, default=[10, 100, 500], help="PDF sizes in pages, comma-separated")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 8, 32], help="Concurrent /chat requests, comma-separated")
+    parser.add_argument("--requests", type=int, default=200, help="/chat requests per concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes (own server only)")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Fake embedder seconds per request")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM seconds before the answer")
+    parser.add_argument("--llm-words-per-second", type=float, default=0.0, help="Fake LLM streaming rate (0 = instant)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmark-<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression against the baseline (fraction)")
+    args = parser.parse_args()
+
+    output = args.output or Path(f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with tempfile.TemporaryDirectory(prefix="pdf-chat-bench-") as tmp:
+        workdir = Path(tmp)
+        server = None
+        if args.url:
+            client = ApiClient(args.url)
+        else:
+            port = free_port()
+            server = start_server(workdir, port, args)
+            client = ApiClient(f"http://127.0.0.1:{port}")
+        try:
+            wait_until_ready(client, server)
+
+            ingest_runs, largest = [], None
+            for i, pages in enumerate(args.pages):
+                pdf_path = workdir / f"synthetic-{pages}p.pdf"
+                fact_count = generate_pdf(pdf_path, pages, seed=args.seed + i)
+                run = run_ingestion(client, pdf_path, pages)
+                print(f"ingest {pages:>5} pages: {run['seconds']:.2f}s, {run['pages_per_second']} pages/s, "
+                      f"{run['chunks_per_second']} chunks/s")
+                ingest_runs.append(run)
+                if largest is None or pages > largest[0]:
+                    largest = (pages, run["session_id"], fact_count)
+
+            chat_runs = []
+            if largest is not None:
+                _, session_id, fact_count = largest
+                for level in args.concurrency:
+                    run = run_chat_load(client, session_id, level, args.requests, fact_count, args.seed + level)
+                    latency = run["latency_seconds"]
+                    print(f"chat concurrency {level:>3}: p50 {latency['p50']}s, p95 {latency['p95']}s, "
+                          f"p99 {latency['p99']}s, {run['requests_per_second']} req/s, status {run['status_counts']}")
+                    chat_runs.append(run)
+        finally:
+            if server is not None:
+                server.terminate()
+                try:
+                    server.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "url": args.url,
+            "backends": "server" if args.url else "fake",
+            "workers": None if args.url else args.workers,
+            "embed_latency": args.embed_latency,
+            "llm_latency": args.llm_latency,
+            "llm_words_per_second": args.llm_words_per_second,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "ingest": ingest_runs,
+        "chat": chat_runs,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,86 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Optional
-from PyPDF2 import PdfReader
-from pptx import Presentation
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Iterator, List, Dict, Optional, Tuple
 import os
+import sys
 import asyncio
-import tempfile
+import threading
+import multiprocessing
+import shutil
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import json
+import hashlib
+import numpy as np
 import uuid
 from datetime import datetime
 from pathlib import Path
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
-
-from langchain.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
-from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
 
-# Load environment variables and configure Google API
+# langchain, FAISS, PyPDF2, python-pptx and the model SDKs are imported where they are
+# used (or through LazyModule), so a worker starts serving without loading them
+
+try:
+    from .admission import AdmissionController, Overloaded
+    from .answer_cache import AnswerCache
+    from .document_store import DocumentStore, document_key, move_store
+    from .index_cache import VectorStoreCache
+    from .ingest_jobs import IngestJob, IngestJobManager
+    from .lazy_import import LazyModule, load_times
+    from .mineru_output import chunk_content_list, chunk_markdown, find_output
+    from .ocr_fallback import OcrMerger, ocr_available, ocr_pages
+    from .model_backends import create_chat_model, create_embeddings, embedding_model_name, require_google_key
+    from .pdf_text import IncrementalChunker, iter_pdf_pages_parallel, remove_quietly, spool_to_file, spool_upload
+    from .session_catalog import SessionCatalog
+    from .session_gc import SessionSweeper, directory_size
+    from .telemetry import (
+        HTTP_SECONDS, add_collector, configure_logging, count, gauge_lines, in_context, log_event, log_sampled,
+        record, render, request_timings, server_timing_header, stage, submit_in_context,
+    )
+except ImportError:  # running from inside pdf_extraction/src (uvicorn chat_with_pdf:app)
+    from admission import AdmissionController, Overloaded
+    from answer_cache import AnswerCache
+    from document_store import DocumentStore, document_key, move_store
+    from index_cache import VectorStoreCache
+    from ingest_jobs import IngestJob, IngestJobManager
+    from lazy_import import LazyModule, load_times
+    from mineru_output import chunk_content_list, chunk_markdown, find_output
+    from ocr_fallback import OcrMerger, ocr_available, ocr_pages
+    from model_backends import create_chat_model, create_embeddings, embedding_model_name, require_google_key
+    from pdf_text import IncrementalChunker, iter_pdf_pages_parallel, remove_quietly, spool_to_file, spool_upload
+    from session_catalog import SessionCatalog
+    from session_gc import SessionSweeper, directory_size
+    from telemetry import (
+        HTTP_SECONDS, add_collector, configure_logging, count, gauge_lines, in_context, log_event, log_sampled,
+        record, render, request_timings, server_timing_header, stage, submit_in_context,
+    )
+
+# Sibling modules built on langchain and FAISS, imported on first use
+chunk_store = LazyModule("chunk_store", __package__ or None)
+embedding_cache = LazyModule("embedding_cache", __package__ or None)
+embedding_pipeline = LazyModule("embedding_pipeline", __package__ or None)
+index_builder = LazyModule("index_builder", __package__ or None)
+
+# Load environment variables; the Google API is configured only if a Google backend is used.
+# The "fake" backends are local stand-ins for benchmarks and offline development.
 load_dotenv()
-if not os.getenv("GOOGLE_API_KEY"):
-    raise RuntimeError("GOOGLE_API_KEY is not set in environment")
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+EMBEDDING_BACKEND = os.getenv("PDF_CHAT_EMBEDDING_BACKEND", "google")
+LLM_BACKEND = os.getenv("PDF_CHAT_LLM_BACKEND", "google")
+if "google" in (EMBEDDING_BACKEND, LLM_BACKEND):
+    require_google_key(os.getenv("GOOGLE_API_KEY"))
+
+# Structured logs; hot-path events (e.g. per-question retrieval details) are sampled
+configure_logging(
+    sample_rate=float(os.getenv("PDF_CHAT_LOG_SAMPLE_RATE", "0.1")),
+    serialize=os.getenv("PDF_CHAT_LOG_JSON", "0") == "1",
+    level=os.getenv("PDF_CHAT_LOG_LEVEL", "INFO"),
+)
 
 app = FastAPI(title="PDF Chat API", version="1.0.0")
 app.add_middleware(
@@ -36,121 +91,1052 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global storage for sessions and documents
-sessions: Dict[str, Dict] = {}
+# Session storage; the catalog indexes every session's metadata for listing and lookups
 SESSION_DIR = Path("sessions")
 SESSION_DIR.mkdir(exist_ok=True)
+session_catalog = SessionCatalog(Path(os.getenv("PDF_CHAT_SESSION_CATALOG", str(SESSION_DIR / "catalog.sqlite"))))
+session_catalog.backfill(SESSION_DIR)
 
-# Function to extract text from PDF files
-def get_pdf_text(pdf_docs: List[UploadFile]) -> str:
-    text = ""
-    for pdf in pdf_docs:
-        tmp_path = None
+# Sessions saved with LangChain's pickled docstore are converted once, here, so no request
+# ever unpickles; chunk_store (and langchain) is only imported if such a session exists
+if session_catalog.get_meta("chunk_stores_converted") is None:
+    errors: List[str] = []
+    if any(SESSION_DIR.glob("*/faiss_index/index.pkl")):
+        converted, errors = chunk_store.convert_legacy_sessions(SESSION_DIR)
+        log_event("legacy_sessions_converted", converted=converted, failed=len(errors))
+        for error in errors:
+            log_event("legacy_session_conversion_failed", level="ERROR", error=error)
+    # Failed sessions are retried on the next start; until then requests reject them
+    if not errors:
+        session_catalog.set_meta("chunk_stores_converted", "1")
+
+# Background session expiry (by last access) and disk quota (least recently used first)
+SESSION_SWEEP_INTERVAL = float(os.getenv("PDF_CHAT_SESSION_SWEEP_SECONDS", "300"))
+
+# Loaded FAISS indexes shared by all requests in this worker
+index_cache = VectorStoreCache(
+    max_entries=int(os.getenv("PDF_CHAT_INDEX_CACHE_ENTRIES", "32")),
+    max_bytes=int(os.getenv("PDF_CHAT_INDEX_CACHE_MB", "1024")) * 1024 * 1024,
+)
+
+# Answers to repeated (or, above the similarity threshold, paraphrased) questions per session
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("PDF_CHAT_ANSWER_CACHE_ENTRIES", "512")),
+    ttl_seconds=float(os.getenv("PDF_CHAT_ANSWER_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("PDF_CHAT_ANSWER_CACHE_SIMILARITY", "0")),
+)
+
+# Chunk embeddings shared by all sessions, so re-uploaded documents are not re-embedded;
+# opened on first use (see get_embedding_cache)
+CACHE_DIR = Path(os.getenv("PDF_CHAT_CACHE_DIR", "cache"))
+EMBED_CACHE_BYTES = int(os.getenv("PDF_CHAT_EMBED_CACHE_MB", "512")) * 1024 * 1024
+_embedding_cache = None
+
+# Chunk texts and vectors of every processed PDF, keyed by content hash and processing settings,
+# so re-uploads of the same file in any session reuse them instead of extracting and embedding again.
+# Sessions read their chunk texts from it, so it is session data and lives with the sessions.
+DOCUMENT_STORE_PATH = Path(os.getenv("PDF_CHAT_DOCUMENT_STORE", str(SESSION_DIR / "documents.sqlite")))
+move_store(CACHE_DIR / "documents.sqlite", DOCUMENT_STORE_PATH)
+document_store = DocumentStore(DOCUMENT_STORE_PATH)
+
+# Background ingestion; the concurrency limit keeps big uploads from starving /chat. It holds
+# for all workers together: jobs take lock-file slots under the shared session directory.
+ingest_jobs = IngestJobManager(
+    Path(os.getenv("PDF_CHAT_JOB_DIR", "jobs")),
+    max_concurrency=int(os.getenv("PDF_CHAT_INGEST_CONCURRENCY", "2")),
+    slot_dir=SESSION_DIR / ".ingest_slots",
+)
+
+# Seconds running ingestion jobs may take to finish when the server shuts down
+DRAIN_SECONDS = float(os.getenv("PDF_CHAT_DRAIN_SECONDS", "30"))
+
+# /chat runs answer_question on its own bounded pool; excess requests queue briefly, then get 429/503
+chat_admission = AdmissionController(
+    "chat",
+    max_in_flight=int(os.getenv("PDF_CHAT_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("PDF_CHAT_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("PDF_CHAT_QUEUE_TIMEOUT", "10")),
+)
+
+# Per-request stage timings are returned as Server-Timing; latency is recorded per route template
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    with request_timings() as timings:
+        started = time.perf_counter()
+        response = await call_next(request)
+        total = time.perf_counter() - started
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(total, request.method, getattr(route, "path", "unmatched"), str(response.status_code))
+    # Streaming responses report only what ran before their first byte
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    response.headers["X-Response-Time"] = f"{total * 1000:.1f}ms"
+    return response
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Function to split text into chunks
+CHUNK_SIZE = 10000
+CHUNK_OVERLAP = 1000
+
+def get_text_splitter():
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+def get_text_chunks(text):
+    chunks = get_text_splitter().split_text(text)
+    return chunks
+
+# Page extraction pool; PyPDF2 is pure Python, so large PDFs are split across processes
+EXTRACT_WORKERS = int(os.getenv("PDF_CHAT_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EXTRACT_PAGES_PER_SHARD = int(os.getenv("PDF_CHAT_EXTRACT_PAGES_PER_SHARD", "8"))
+EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("PDF_CHAT_EXTRACT_PARALLEL_MIN_PAGES", "32"))
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_extract_pool_lock = threading.Lock()
+
+def get_extract_pool() -> Optional[ProcessPoolExecutor]:
+    global _extract_pool
+    if EXTRACT_WORKERS < 2:
+        return None
+    if _extract_pool is None:
+        with _extract_pool_lock:
+            if _extract_pool is None:
+                # spawn: forking a process that already runs event loop and client threads is unsafe
+                _extract_pool = ProcessPoolExecutor(
+                    max_workers=EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _extract_pool
+
+# OCR fallback for pages PyPDF2 finds no text on (scanned pages); only those pages go
+# through MinerU's OCR pipeline, on a pool of its own since each worker loads the models
+OCR_FALLBACK = os.getenv("PDF_CHAT_OCR_FALLBACK", "1") == "1" and ocr_available()
+OCR_WORKERS = max(1, int(os.getenv("PDF_CHAT_OCR_WORKERS", "1")))
+OCR_MIN_CHARS = int(os.getenv("PDF_CHAT_OCR_MIN_CHARS", "1"))
+OCR_PAGES_PER_BATCH = int(os.getenv("PDF_CHAT_OCR_PAGES_PER_BATCH", "8"))
+OCR_LANG = os.getenv("PDF_CHAT_OCR_LANG", "en")
+# Stored documents record whether scanned pages were OCR'd, so enabling OCR re-extracts them
+PDF_EXTRACTION = "pypdf+ocr" if OCR_FALLBACK else "pypdf"
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = ProcessPoolExecutor(
+                    max_workers=OCR_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _ocr_pool
+
+# Offline MinerU output (run_extractor.py), looked up by the sha256 of each uploaded PDF
+MINERU_OUTPUT_DIR = Path(os.getenv("PDF_CHAT_MINERU_OUTPUT_DIR", str(Path(__file__).parent / "data" / "output")))
+
+# Function to chunk a PDF from its MinerU output (found via run_extractor.py's hash index);
+# returns (chunks, metadatas, text_length)
+def get_mineru_chunks(filename: str, mineru_output: Tuple[Path, Path], job: Optional[IngestJob] = None):
+    content_list_path, markdown_path = mineru_output
+    with stage("chunk"):
+        if content_list_path.exists():
+            chunks, metadatas, text_length, page_count = chunk_content_list(
+                content_list_path, get_text_splitter(), CHUNK_SIZE, filename
+            )
+            count("parse", page_count, "pages")
+            if job is not None:
+                job.add_pages(page_count)
+        else:
+            chunks, metadatas, text_length = chunk_markdown(markdown_path, get_text_splitter(), filename)
+    count("chunk", len(chunks), "chunks")
+    if job is not None:
+        job.add_chunks(len(chunks))
+    log_event("document_chunked", filename=filename, extraction="mineru", chunks=len(chunks))
+    return chunks, metadatas, text_length
+
+# Function to extract and chunk text from one spooled PDF with PyPDF2, streaming page by page;
+# pages without a text layer are OCR'd when the fallback is enabled. Returns (chunks, metadatas, text_length)
+def get_pdf_chunks(filename: str, pdf_path: Path, job: Optional[IngestJob] = None):
+    chunks: List[str] = []
+    text_length = 0
+    chunker = IncrementalChunker(get_text_splitter(), CHUNK_SIZE)
+    pages = iter_pdf_pages_parallel(
+        pdf_path,
+        get_extract_pool(),
+        EXTRACT_WORKERS,
+        pages_per_shard=EXTRACT_PAGES_PER_SHARD,
+        min_pages=EXTRACT_PARALLEL_MIN_PAGES,
+    )
+    ocr = None
+    if OCR_FALLBACK:
+        ocr = OcrMerger(
+            lambda page_indices: get_ocr_pool().submit(ocr_pages, str(pdf_path), page_indices, OCR_LANG),
+            min_chars=OCR_MIN_CHARS,
+            pages_per_batch=OCR_PAGES_PER_BATCH,
+        )
+        pages = ocr.pages(pages)
+    # Parsing and chunking are interleaved; the time spent in the chunker is measured
+    # separately and everything else (waiting for page text) counts as parsing
+    started = time.perf_counter()
+    chunk_seconds = 0.0
+    page_count = 0
+    for page_text in pages:
+        page_count += 1
+        text_length += len(page_text)
+        chunk_started = time.perf_counter()
+        new_chunks = chunker.feed(page_text + "\n")
+        chunk_seconds += time.perf_counter() - chunk_started
+        chunks.extend(new_chunks)
+        if job is not None:
+            job.add_pages()
+            job.add_chunks(len(new_chunks))
+    if job is not None:
+        job.set_stage("chunking")
+    chunk_started = time.perf_counter()
+    new_chunks = chunker.flush()
+    chunk_seconds += time.perf_counter() - chunk_started
+    chunks.extend(new_chunks)
+    if job is not None:
+        job.add_chunks(len(new_chunks))
+    record("parse", time.perf_counter() - started - chunk_seconds)
+    record("chunk", chunk_seconds)
+    count("parse", page_count, "pages")
+    count("chunk", len(chunks), "chunks")
+    metadata = {"source": filename, "extraction": "pypdf"}
+    if ocr is not None:
+        for error in ocr.errors:
+            log_event("ocr_failed", level="WARNING", filename=filename, error=error)
+        if ocr.ocr_pages:
+            # Worker time; it overlaps the parse stage, which includes waiting for OCR results
+            record("ocr", ocr.ocr_seconds)
+            count("ocr", ocr.ocr_pages, "pages")
+            log_event("ocr_fallback", filename=filename, pages=page_count, ocr_pages=ocr.ocr_pages,
+                      seconds=round(ocr.ocr_seconds, 3))
+            metadata = {"source": filename, "extraction": "pypdf+ocr", "ocr_pages": ocr.ocr_pages}
+    return chunks, [dict(metadata) for _ in chunks], text_length
+
+# Function to turn spooled PDFs into documents ready to index. Each is looked up in the
+# document store by content hash and processing settings; only files not seen before are
+# extracted (from MinerU output when available, else with PyPDF2) and embedded.
+# Every returned document is referenced by session_id in the document store; the key of each
+# reference taken is appended to acquired, so a failed ingestion can give them back.
+def prepare_documents(
+    session_id: str, pdf_docs: List[Tuple[str, Path, str]], job: Optional[IngestJob] = None,
+    acquired: Optional[List[str]] = None,
+) -> List[Dict]:
+    acquired = acquired if acquired is not None else []
+    documents: List[Dict] = []
+    new_documents: List[Dict] = []
+    for filename, pdf_path, sha256 in pdf_docs:
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                data = pdf.file.read()
-                tmp.write(data)
-                tmp_path = tmp.name
-            pdf_reader = PdfReader(tmp_path)
-            for page in pdf_reader.pages:
-                text += (page.extract_text() or "")
+            if job is not None:
+                job.set_stage("extracting")
+            mineru_output = find_output(MINERU_OUTPUT_DIR, sha256)
+            key = document_key(
+                sha256, "mineru" if mineru_output else PDF_EXTRACTION, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+            )
+            stored = document_store.acquire(key, session_id)
+            if stored is not None:
+                acquired.append(key)
+                log_event("document_reused", filename=filename, chunks=stored["chunk_count"])
+                count("document_reuse", 1, "documents")
+                if job is not None:
+                    job.add_chunks(stored["chunk_count"])
+                    job.add_embedded(stored["chunk_count"])
+                # The same bytes may have been uploaded under another name
+                metadatas = [{**metadata, "source": filename} for metadata in stored["metadatas"]]
+                documents.append({"key": key, "vectors": stored["vectors"], "metadatas": metadatas,
+                                  "text_length": stored["text_length"]})
+                continue
+
+            if mineru_output is not None:
+                chunks, metadatas, text_length = get_mineru_chunks(filename, mineru_output, job)
+            else:
+                chunks, metadatas, text_length = get_pdf_chunks(filename, pdf_path, job)
         except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to read PDF '{pdf.filename}': {e}")
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except Exception:
-                    pass
-    return text
+            raise HTTPException(status_code=400, detail=f"Failed to read PDF '{filename}': {e}")
+        if not chunks:
+            continue
+        document = {"key": key, "chunks": chunks, "metadatas": metadatas, "text_length": text_length}
+        documents.append(document)
+        new_documents.append(document)
+
+    if new_documents:
+        # One embedding pass over all new documents so batches stay full
+        if job is not None:
+            job.set_stage("embedding")
+        progress = job.add_embedded if job is not None else None
+        all_chunks = [chunk for document in new_documents for chunk in document["chunks"]]
+        with stage("embed"):
+            vectors = np.asarray(get_ingest_embeddings(progress).embed_documents(all_chunks), dtype="float32")
+        count("embed", len(all_chunks), "chunks")
+        start = 0
+        for document in new_documents:
+            stop = start + len(document["chunks"])
+            document["vectors"] = vectors[start:stop]
+            start = stop
+            document_store.put(
+                document["key"], session_id, document["chunks"], document["metadatas"],
+                document["vectors"], document["text_length"],
+            )
+            acquired.append(document["key"])
+    return documents
 
 # Function to extract text from PPTX files (kept for compatibility)
 def get_pptx_text(pptx_docs: List[UploadFile]) -> str:
     text = ""
     for pptx in pptx_docs:
-        tmp_path = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pptx") as tmp:
-                data = pptx.file.read()
-                tmp.write(data)
-                tmp_path = tmp.name
-            presentation = Presentation(tmp_path)
-            for slide in presentation.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text += shape.text + "\n"
+            with spool_upload(pptx.file, suffix=".pptx") as tmp_path:
+                from pptx import Presentation
+                presentation = Presentation(str(tmp_path))
+                for slide in presentation.slides:
+                    for shape in slide.shapes:
+                        if hasattr(shape, "text"):
+                            text += shape.text + "\n"
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to read PPTX '{pptx.filename}': {e}")
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except Exception:
-                    pass
     return text
 
-# Function to split text into chunks
-def get_text_chunks(text):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
-    chunks = text_splitter.split_text(text)
-    return chunks
+# Shared embedding client and QA chain, built once per worker on first use
+FAKE_EMBEDDING_DIM = int(os.getenv("PDF_CHAT_FAKE_EMBEDDING_DIM", "768"))
+FAKE_EMBED_LATENCY = float(os.getenv("PDF_CHAT_FAKE_EMBED_LATENCY", "0.05"))
+FAKE_LLM_LATENCY = float(os.getenv("PDF_CHAT_FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_WORDS_PER_SECOND = float(os.getenv("PDF_CHAT_FAKE_LLM_WORDS_PER_SECOND", "0"))
+# Recorded with cached embeddings and stored documents, so backends never share vectors
+EMBEDDING_MODEL = embedding_model_name(EMBEDDING_BACKEND, FAKE_EMBEDDING_DIM)
+_embeddings = None
+_qa_chain = None
+# One lock per lazily built client: a builder that needs another client (the chain needs the
+# chat model) must never wait on a lock its own thread already holds
+_embeddings_lock = threading.Lock()
+_embedding_cache_lock = threading.Lock()
+_chat_model_lock = threading.Lock()
+_qa_chain_lock = threading.Lock()
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = create_embeddings(EMBEDDING_BACKEND, FAKE_EMBEDDING_DIM, FAKE_EMBED_LATENCY)
+    return _embeddings
+
+# Ingestion batching; the rate limiter is shared so concurrent uploads stay within the API quota together
+EMBED_BATCH_SIZE = int(os.getenv("PDF_CHAT_EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("PDF_CHAT_EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("PDF_CHAT_EMBED_MAX_RETRIES", "5"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("PDF_CHAT_EMBED_REQUESTS_PER_MINUTE", "0"))
+_embed_rate_limiter = None
+
+def get_embedding_cache():
+    global _embedding_cache, _embed_rate_limiter
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embed_rate_limiter = embedding_pipeline.RateLimiter(EMBED_REQUESTS_PER_MINUTE)
+                _embedding_cache = embedding_cache.EmbeddingCache(CACHE_DIR / "embeddings.sqlite", max_bytes=EMBED_CACHE_BYTES)
+    return _embedding_cache
+
+# Embeddings used at ingestion time: cached chunks are read from disk, only misses hit the API,
+# in concurrent retried batches
+def get_ingest_embeddings(progress=None):
+    cache = get_embedding_cache()
+    batched = embedding_pipeline.BatchedEmbeddings(
+        get_embeddings(),
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_CONCURRENCY,
+        max_retries=EMBED_MAX_RETRIES,
+        rate_limiter=_embed_rate_limiter,
+        progress=progress,
+    )
+    return embedding_cache.CachedEmbeddings(batched, cache, EMBEDDING_MODEL, progress=progress)
+
+# Serializes writers of one session (appends, rebuilds) within this process and, where
+# flock is available, across worker processes
+_session_locks: Dict[str, threading.Lock] = {}
+_session_locks_guard = threading.Lock()
+
+@contextmanager
+def session_write_lock(session_id: str):
+    with _session_locks_guard:
+        lock = _session_locks.setdefault(session_id, threading.Lock())
+    with lock:
+        session_path = SESSION_DIR / session_id
+        session_path.mkdir(exist_ok=True)
+        try:
+            import fcntl
+        except ImportError:  # Windows: in-process lock only
+            yield
+            return
+        with open(session_path / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Function to write a freshly built index directory next to the live one and swap it in,
+# so readers never see a partial save
+def save_index_atomically(index, metadatas: List[Dict], refs: List[Tuple[str, int]], index_path: Path) -> None:
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    old_path = index_path.with_name(index_path.name + ".old")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir()
+    import faiss
+    faiss.write_index(index, str(tmp_path / "index.faiss"))
+    chunk_store.write_chunks(tmp_path / "chunks.sqlite", 0, [""] * len(refs), metadatas, refs)
+    if index_path.exists():
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(index_path, old_path)
+    os.replace(tmp_path, index_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+# Index type thresholds: exact search while small, then HNSW, then quantized IVF
+INDEX_FLAT_MAX = int(os.getenv("PDF_CHAT_INDEX_FLAT_MAX", "10000"))
+INDEX_HNSW_MAX = int(os.getenv("PDF_CHAT_INDEX_HNSW_MAX", "200000"))
+INDEX_LARGE_TYPE = os.getenv("PDF_CHAT_INDEX_LARGE_TYPE", "ivfpq")  # or "ivfsq8"
+
+def get_index_spec(vector_count: int, dim: int) -> Dict:
+    return index_builder.choose_index_spec(
+        vector_count, dim, flat_max=INDEX_FLAT_MAX, hnsw_max=INDEX_HNSW_MAX, large_type=INDEX_LARGE_TYPE
+    )
+
+# Function to create and save vector store with session support; with an existing_spec the new
+# chunks are added to the session's existing index instead of replacing it.
+# Returns the index spec (type, params, vector count) to record in session metadata.
+def get_vector_store(
+    documents: List[Dict],
+    session_id: str,
+    job: Optional[IngestJob] = None,
+    existing_spec: Optional[Dict] = None,
+) -> Dict:
+    if job is not None:
+        job.set_stage("indexing")
+    vectors = np.concatenate([document["vectors"] for document in documents]).astype("float32", copy=False)
+    metadatas = [metadata for document in documents for metadata in document["metadatas"]]
+    # Chunk texts stay in the document store; the session stores references to them
+    refs = [(document["key"], position) for document in documents for position in range(len(document["metadatas"]))]
 
-# Function to create and save vector store with session support
-def get_vector_store(text_chunks, session_id: str):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    
     # Create session-specific directory
     session_path = SESSION_DIR / session_id
     session_path.mkdir(exist_ok=True)
-    
-    # Save vector store with session ID
-    vector_store.save_local(str(session_path / "faiss_index"))
-    return vector_store
+    index_path = session_path / "faiss_index"
+
+    import faiss
+    if existing_spec is not None and (index_path / "index.faiss").exists():
+        with stage("index_build"):
+            # Read a private writable copy: the cached instance is mapped read-only
+            index = faiss.read_index(str(index_path / "index.faiss"))
+            start = index.ntotal
+            target_spec = get_index_spec(start + len(vectors), vectors.shape[1])
+            index, rebuilt = index_builder.extend_index(index, vectors, target_spec)
+        # Same index type as before keeps the parameters it was built with
+        spec = target_spec if rebuilt or existing_spec.get("type") != target_spec["type"] else existing_spec
+
+        with stage("index_save"):
+            # New rows go in first; readers only look up positions their index returns,
+            # and the index file itself is swapped in with a single rename
+            chunk_store.write_chunks(chunk_store.ensure_chunk_store(index_path), start, [""] * len(refs), metadatas, refs)
+            tmp_index = index_path / "index.faiss.tmp"
+            faiss.write_index(index, str(tmp_index))
+            os.replace(tmp_index, index_path / "index.faiss")
+    else:
+        spec = get_index_spec(len(vectors), vectors.shape[1])
+        with stage("index_build"):
+            index = index_builder.build_index(vectors, spec)
+        with stage("index_save"):
+            save_index_atomically(index, metadatas, refs, index_path)
+
+    index_cache.invalidate(session_id)
+    answer_cache.invalidate(session_id)
+    return {"type": spec["type"], "params": spec["params"], "vector_count": index.ntotal}
+
+# Version of a session's index on disk (None if it has none); changes whenever the index is rewritten
+def get_index_version(session_id: str) -> Optional[int]:
+    try:
+        return (SESSION_DIR / session_id / "faiss_index" / "index.faiss").stat().st_mtime_ns
+    except OSError:
+        return None
+
+# Approximate per-session overhead of an open chunk store (connection + SQLite page cache)
+CHUNK_STORE_RESIDENT_BYTES = 2 * 1024 * 1024
+
+# Function to load a session's vector store, served from the in-process cache when possible
+def load_vector_store(session_id: str, embeddings, version: Optional[int] = None):
+    index_path = SESSION_DIR / session_id / "faiss_index"
+    if version is None:
+        version = get_index_version(session_id)
+
+    @stage("index_load")
+    def _load():
+        # Memory-mapped, read-only: vector data stays in the page cache shared by all
+        # workers and is only paged in when searched. Writers always load a private copy.
+        from langchain.vectorstores import FAISS
+        index, mapped = index_builder.read_index_mapped(index_path / "index.faiss")
+        # Chunk texts are read lazily from SQLite by vector position; nothing is unpickled
+        docstore = chunk_store.SqliteDocstore(chunk_store.ensure_chunk_store(index_path), document_store.path)
+        store = FAISS(embeddings, index, docstore, chunk_store.PositionalIds(index.ntotal))
+        session_info = session_catalog.get(session_id) or read_session_info(session_id) or {}
+        index_builder.apply_search_params(store.index, session_info.get("index"))
+        # Mapped vectors live in the shared page cache and chunks stay on disk, so only
+        # a non-mapped index counts against the cache budget
+        size = CHUNK_STORE_RESIDENT_BYTES
+        if not mapped:
+            size += (index_path / "index.faiss").stat().st_size
+        return store, size
+
+    return index_cache.get_or_load(session_id, _load, version)
+
+# Prompt shared by the QA chain and the streaming /chat path
+PROMPT_TEMPLATE = (
+    "You are a helpful assistant that answers questions based on the provided document context. "
+    "Use the context below to answer the question as accurately and comprehensively as possible. "
+    "If the exact answer is not in the context, provide the most relevant information available "
+    "and indicate what information might be missing.\n\n"
+    "Context:\n{context}\n\n"
+    "Question: {question}\n\n"
+    "Answer (be specific and helpful):"
+)
+NO_DOCS_ANSWER = "I couldn't find any relevant information in the uploaded documents. Please try rephrasing your question or upload relevant documents."
+_chat_model = None
+
+def get_chat_model():
+    global _chat_model
+    if _chat_model is None:
+        with _chat_model_lock:
+            if _chat_model is None:
+                _chat_model = create_chat_model(LLM_BACKEND, FAKE_LLM_LATENCY, FAKE_LLM_WORDS_PER_SECOND)
+    return _chat_model
+
+def get_prompt():
+    from langchain.prompts import PromptTemplate
+    return PromptTemplate(template=PROMPT_TEMPLATE, input_variables=["context", "question"])
 
 # Function to create conversational chain with improved prompt
-def get_conversational_chain():
-    prompt_template = (
-        "You are a helpful assistant that answers questions based on the provided document context. "
-        "Use the context below to answer the question as accurately and comprehensively as possible. "
-        "If the exact answer is not in the context, provide the most relevant information available "
-        "and indicate what information might be missing.\n\n"
-        "Context:\n{context}\n\n"
-        "Question: {question}\n\n"
-        "Answer (be specific and helpful):"
-    )
-    model = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.3)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
+def build_conversational_chain(model):
+    from langchain.chains.question_answering import load_qa_chain
+    chain = load_qa_chain(model, chain_type="stuff", prompt=get_prompt())
     return chain
 
-# Function to handle user input with session support and improved retrieval
-def answer_question(user_question: str, session_id: str) -> str:
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    session_path = SESSION_DIR / session_id / "faiss_index"
-    
+# The chain holds no per-call state (no memory), so one instance can serve concurrent requests
+def get_conversational_chain():
+    global _qa_chain
+    if _qa_chain is None:
+        # Built before taking the chain lock, which is never held while waiting for another client
+        model = get_chat_model()
+        with _qa_chain_lock:
+            if _qa_chain is None:
+                _qa_chain = build_conversational_chain(model)
+    return _qa_chain
+
+# Chunks retrieved per question; with several sessions this is the global top-k across all of them
+RETRIEVAL_K = 5
+MAX_FEDERATED_SESSIONS = int(os.getenv("PDF_CHAT_MAX_FEDERATED_SESSIONS", "16"))
+_retrieval_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PDF_CHAT_RETRIEVAL_CONCURRENCY", "8")), thread_name_prefix="retrieval"
+)
+
+# Function to search one session for several query vectors with a single index call.
+# Returns, per query, (document, distance) pairs; documents carry their session id and distance.
+def search_session_batch(session_id: str, query_vectors: List[List[float]], embeddings, k: int = RETRIEVAL_K):
     try:
-        new_db = FAISS.load_local(str(session_path), embeddings, allow_dangerous_deserialization=True)
+        store = load_vector_store(session_id, embeddings)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Vector index not found for session. Please upload documents first. Error: {e}")
-    
-    # Improved similarity search with more results and score threshold
-    docs = new_db.similarity_search(user_question, k=5)
-    
-    # Debug: Print retrieved documents (remove in production)
-    print(f"Found {len(docs)} documents for question: {user_question}")
-    for i, doc in enumerate(docs):
-        print(f"Doc {i+1} preview: {doc.page_content[:200]}...")
-    
+        raise HTTPException(status_code=400, detail=f"Vector index not found for session {session_id}. Please upload documents first. Error: {e}")
+
+    with stage("search"):
+        distances, positions = store.index.search(np.asarray(query_vectors, dtype=np.float32), k)
+    results = []
+    for row_distances, row_positions in zip(distances, positions):
+        hits = []
+        for score, position in zip(row_distances, row_positions):
+            if position == -1:  # fewer than k vectors in the index
+                continue
+            docstore_id = store.index_to_docstore_id[int(position)]
+            doc = store.docstore.search(docstore_id)
+            if isinstance(doc, str):  # docstores return a "not found" message for a missing row
+                log_event("chunk_missing", level="WARNING", session_id=session_id, docstore_id=docstore_id)
+                continue
+            doc.metadata["session_id"] = session_id
+            doc.metadata["score"] = float(score)
+            hits.append((doc, float(score)))
+        results.append(hits)
+    return results
+
+# Function to search several sessions for several query vectors in parallel and keep,
+# per query, the global top-k by L2 distance (every session is embedded with the same
+# model, so distances are comparable)
+def search_sessions(session_ids: List[str], query_vectors: List[List[float]], embeddings, k: int = RETRIEVAL_K):
+    if len(session_ids) == 1:
+        per_session = [search_session_batch(session_ids[0], query_vectors, embeddings, k)]
+    else:
+        futures = [
+            submit_in_context(_retrieval_pool, search_session_batch, sid, query_vectors, embeddings, k)
+            for sid in session_ids
+        ]
+        per_session = [future.result() for future in futures]
+    merged = []
+    for i in range(len(query_vectors)):
+        scored = sorted((hit for results in per_session for hit in results[i]), key=lambda hit: hit[1])
+        merged.append([doc for doc, _ in scored[:k]])
+    return merged
+
+# Function to retrieve the most relevant chunks for a question from one or more sessions
+def retrieve_documents(user_question: str, session_ids: List[str], query_vector: Optional[List[float]] = None):
+    embeddings = get_embeddings()
+    if query_vector is None:
+        with stage("embed_query"):
+            query_vector = embeddings.embed_query(user_question)
+    docs = search_sessions(session_ids, [query_vector], embeddings)[0]
+
+    # Retrieved chunks for a sample of questions (PDF_CHAT_LOG_SAMPLE_RATE)
+    log_sampled(
+        "retrieval",
+        question=user_question[:200],
+        session_ids=session_ids,
+        hits=[
+            {"session_id": doc.metadata["session_id"], "score": doc.metadata["score"], "preview": doc.page_content[:200]}
+            for doc in docs
+        ],
+    )
+    return docs
+
+# Answer cache key and index version for a set of sessions; a federated answer is
+# reused only while none of its sessions has changed. Version is None if any index is missing.
+def answer_cache_key(session_ids: List[str]) -> str:
+    return session_ids[0] if len(session_ids) == 1 else "|".join(sorted(session_ids))
+
+def get_sessions_version(session_ids: List[str]):
+    versions = [get_index_version(session_id) for session_id in session_ids]
+    if any(version is None for version in versions):
+        return None
+    return versions[0] if len(versions) == 1 else tuple(versions)
+
+# Function to look up a cached answer; returns (entry, match type, question embedding, index version).
+# The embedding is computed only for the similarity lookup and is reused for retrieval on a miss.
+def lookup_cached_answer(user_question: str, session_ids: List[str]):
+    for session_id in session_ids:
+        session_catalog.touch(session_id)
+    version = get_sessions_version(session_ids)
+    if version is None:
+        return None, None, None, None
+    key = answer_cache_key(session_ids)
+    entry = answer_cache.get_exact(key, user_question, version)
+    if entry is not None:
+        return entry, "exact", None, version
+    query_vector = None
+    if answer_cache.semantic_enabled:
+        with stage("embed_query"):
+            query_vector = get_embeddings().embed_query(user_question)
+        entry = answer_cache.get_similar(key, query_vector, version)
+        if entry is not None:
+            return entry, "semantic", query_vector, version
+    return None, None, query_vector, version
+
+# Function to handle user input for one or more sessions, with answer caching
+def answer_question(user_question: str, session_ids: List[str]) -> Dict:
+    entry, match, query_vector, version = lookup_cached_answer(user_question, session_ids)
+    if entry is not None:
+        return {"answer": entry["answer"], "sources": entry["sources"], "cached": True, "cache_match": match}
+
+    docs = retrieve_documents(user_question, session_ids, query_vector)
     if not docs:
-        return "I couldn't find any relevant information in the uploaded documents. Please try rephrasing your question or upload relevant documents."
+        return {"answer": NO_DOCS_ANSWER, "sources": [], "cached": False, "cache_match": None}
     
     chain = get_conversational_chain()
-    response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
-    return response["output_text"]
+    with stage("llm"):
+        response = chain({"input_documents": docs, "question": user_question}, return_only_outputs=True)
+    answer = response["output_text"]
+    sources = describe_sources(docs)
+    if version is not None:
+        answer_cache.put(answer_cache_key(session_ids), user_question, version, answer, sources, query_vector)
+    return {"answer": answer, "sources": sources, "cached": False, "cache_match": None}
+
+# Batch answering: questions share one embedding call and one index search per session,
+# then the LLM calls run on their own bounded pool
+MAX_BATCH_QUESTIONS = int(os.getenv("PDF_CHAT_MAX_BATCH_QUESTIONS", "100"))
+_batch_llm_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PDF_CHAT_BATCH_LLM_CONCURRENCY", "4")), thread_name_prefix="batch-llm"
+)
+
+# Function to embed several questions in one request
+def embed_questions(questions: List[str]) -> List[List[float]]:
+    embeddings = get_embeddings()
+    try:
+        return embeddings.embed_documents(questions, task_type="retrieval_query")
+    except TypeError:  # embedders without a per-call task type
+        return [embeddings.embed_query(question) for question in questions]
+
+# Function to do everything for a batch except the LLM calls: cache lookups, one batched
+# embedding of the remaining questions and one retrieval pass. Returns per-question items
+# (answered from cache, failed, or holding the retrieved docs) and batch-level timings.
+def prepare_batch(questions: List[str], session_ids: List[str]) -> Tuple[List[Dict], Dict]:
+    started = time.perf_counter()
+    for session_id in session_ids:
+        session_catalog.touch(session_id)
+    version = get_sessions_version(session_ids)
+    key = answer_cache_key(session_ids)
+    items = [{"index": i, "question": question} for i, question in enumerate(questions)]
+
+    pending = []
+    for item in items:
+        if not item["question"] or not item["question"].strip():
+            item["error"] = "Question must not be empty"
+            continue
+        entry = answer_cache.get_exact(key, item["question"], version) if version is not None else None
+        if entry is not None:
+            item.update(answer=entry["answer"], sources=entry["sources"], cached=True, cache_match="exact")
+        else:
+            pending.append(item)
+
+    timings = {"embed_seconds": 0.0, "retrieval_seconds": 0.0}
+    if pending:
+        embed_started = time.perf_counter()
+        vectors = embed_questions([item["question"] for item in pending])
+        timings["embed_seconds"] = round(time.perf_counter() - embed_started, 4)
+        record("embed_query", timings["embed_seconds"])
+        count("embed_query", len(pending), "questions")
+
+        to_retrieve = []
+        for item, vector in zip(pending, vectors):
+            item["vector"] = vector
+            entry = (
+                answer_cache.get_similar(key, vector, version)
+                if version is not None and answer_cache.semantic_enabled else None
+            )
+            if entry is not None:
+                item.update(answer=entry["answer"], sources=entry["sources"], cached=True, cache_match="semantic")
+            else:
+                to_retrieve.append(item)
+
+        if to_retrieve:
+            retrieval_started = time.perf_counter()
+            all_docs = search_sessions(session_ids, [item["vector"] for item in to_retrieve], get_embeddings())
+            timings["retrieval_seconds"] = round(time.perf_counter() - retrieval_started, 4)
+            for item, docs in zip(to_retrieve, all_docs):
+                item["docs"] = docs
+
+    timings["prepare_seconds"] = round(time.perf_counter() - started, 4)
+    return items, {"started": started, "version": version, "key": key, "timings": timings}
+
+# Function to answer one prepared batch item with the LLM
+def answer_batch_item(item: Dict, batch: Dict) -> Dict:
+    llm_started = time.perf_counter()
+    try:
+        docs = item.pop("docs")
+        if not docs:
+            item.update(answer=NO_DOCS_ANSWER, sources=[])
+        else:
+            chain = get_conversational_chain()
+            with stage("llm"):
+                response = chain({"input_documents": docs, "question": item["question"]}, return_only_outputs=True)
+            item.update(answer=response["output_text"], sources=describe_sources(docs))
+            if batch["version"] is not None:
+                answer_cache.put(batch["key"], item["question"], batch["version"], item["answer"], item["sources"], item.get("vector"))
+    except Exception as e:
+        item["error"] = str(e)
+    item["llm_seconds"] = round(time.perf_counter() - llm_started, 4)
+    return item
+
+# Function to run the LLM calls of a prepared batch with bounded parallelism;
+# yields each finished item as soon as it is ready, cached and failed ones first
+def run_batch(items: List[Dict], batch: Dict) -> Iterator[Dict]:
+    futures = []
+    for item in items:
+        if "docs" in item:
+            futures.append(submit_in_context(_batch_llm_pool, answer_batch_item, item, batch))
+        else:
+            yield format_batch_item(item, batch)
+    try:
+        for future in as_completed(futures):
+            yield format_batch_item(future.result(), batch)
+    finally:
+        for future in futures:
+            future.cancel()
+
+def format_batch_item(item: Dict, batch: Dict) -> Dict:
+    return {
+        "index": item["index"],
+        "question": item["question"],
+        "answer": item.get("answer"),
+        "sources": item.get("sources", []),
+        "cached": item.get("cached", False),
+        "cache_match": item.get("cache_match"),
+        "error": item.get("error"),
+        "llm_seconds": item.get("llm_seconds", 0.0),
+        "elapsed_seconds": round(time.perf_counter() - batch["started"], 4),
+    }
+
+def batch_summary(results: List[Dict], batch: Dict) -> Dict:
+    return {
+        "answered": sum(1 for result in results if result["error"] is None),
+        "failed": sum(1 for result in results if result["error"] is not None),
+        "cached": sum(1 for result in results if result["cached"]),
+        "timings": {**batch["timings"], "total_seconds": round(time.perf_counter() - batch["started"], 4)},
+    }
+
+# Function to answer a whole batch and return all results in question order
+def answer_batch(questions: List[str], session_ids: List[str]) -> Dict:
+    items, batch = prepare_batch(questions, session_ids)
+    results = sorted(run_batch(items, batch), key=lambda result: result["index"])
+    return {"session_ids": session_ids, "results": results, **batch_summary(results, batch)}
+
+# Source metadata sent with answers, attributed to the session each chunk came from
+def describe_sources(docs) -> List[Dict]:
+    return [
+        {
+            "rank": i + 1,
+            "session_id": doc.metadata.get("session_id"),
+            "preview": doc.page_content[:200],
+            "metadata": doc.metadata,
+        }
+        for i, doc in enumerate(docs)
+    ]
+
+# Function to collect the session ids of a chat request: session_id and/or repeated session_ids fields
+def resolve_session_ids(session_id: Optional[str], session_ids: Optional[List[str]]) -> List[str]:
+    requested = ([session_id] if session_id else []) + list(session_ids or [])
+    resolved = list(dict.fromkeys(sid.strip() for sid in requested if sid and sid.strip()))
+    if not resolved:
+        raise HTTPException(status_code=400, detail="Session ID is required")
+    if len(resolved) > MAX_FEDERATED_SESSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FEDERATED_SESSIONS} sessions can be queried at once")
+    return resolved
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Warm-up builds the shared clients, which imports langchain and the model SDKs. "background"
+# lets the worker serve right away (requests that need a client wait for it), "blocking"
+# finishes it before the worker accepts requests, "off" leaves it to the first request.
+WARMUP_MODE = os.getenv("PDF_CHAT_WARMUP", "background")
+# Modules the startup report checks for, to catch eager imports creeping back in
+DEFERRED_MODULES = (
+    "langchain", "langchain_core", "langchain_community", "faiss", "PyPDF2", "pptx",
+    "google.generativeai", "langchain_google_genai", "mineru", "pypdfium2",
+)
+# Most recently used sessions whose indexes are loaded into the index cache during warm-up
+PRELOAD_SESSIONS = int(os.getenv("PDF_CHAT_PRELOAD_SESSIONS", "0"))
+startup_report: Dict = {}
+_warmup_task: Optional[asyncio.Task] = None
+
+def warm_up_clients() -> None:
+    get_embeddings()
+    get_chat_model()
+    get_conversational_chain()
+    if os.getenv("PDF_CHAT_WARMUP_PING", "1") == "1":
+        # One tiny embedding call opens the connection to the API up front
+        try:
+            get_embeddings().embed_query("warm-up")
+        except Exception as e:
+            log_event("warmup_ping_failed", level="WARNING", error=str(e))
+    preloaded = 0
+    session_ids = session_catalog.most_recently_used(PRELOAD_SESSIONS) if PRELOAD_SESSIONS > 0 else []
+    for session_id in session_ids:
+        try:
+            load_vector_store(session_id, get_embeddings())
+            preloaded += 1
+        except Exception as e:
+            log_event("session_preload_failed", level="WARNING", session_id=session_id, error=str(e))
+    startup_report["sessions_preloaded"] = preloaded
+
+async def run_warm_up():
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(warm_up_clients)
+    except Exception as e:
+        log_event("warmup_failed", level="WARNING", error=str(e))
+        return
+    startup_report["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    log_event("warmup_complete", seconds=startup_report["warmup_seconds"], deferred_imports=load_times())
+
+@app.on_event("startup")
+async def warm_up():
+    """Warm up the shared clients (see PDF_CHAT_WARMUP) and log how long startup took"""
+    global _warmup_task
+    if WARMUP_MODE == "blocking":
+        await run_warm_up()
+    elif WARMUP_MODE == "background":
+        _warmup_task = asyncio.create_task(run_warm_up())
+    startup_report.update(
+        import_seconds=IMPORT_SECONDS,
+        ready_seconds=round(time.perf_counter() - _import_started, 3),
+        modules_loaded=len(sys.modules),
+        deferred_modules_loaded=[name for name in DEFERRED_MODULES if name in sys.modules],
+    )
+    log_event("startup", warmup=WARMUP_MODE, **startup_report)
+
+def startup_metrics() -> List[str]:
+    phases = {(("phase", phase),): startup_report[f"{phase}_seconds"]
+              for phase in ("import", "ready", "warmup") if f"{phase}_seconds" in startup_report}
+    return gauge_lines("pdf_chat_startup_seconds", "Module import, time to ready and warm-up duration of this worker", phases)
+
+add_collector(startup_metrics)
+
+session_sweeper = SessionSweeper(
+    session_catalog,
+    SESSION_DIR,
+    lambda session_id, accessed_before: remove_session(session_id, accessed_before),
+    ttl_seconds=float(os.getenv("PDF_CHAT_SESSION_TTL_HOURS", "0")) * 3600,
+    quota_bytes=int(float(os.getenv("PDF_CHAT_SESSION_QUOTA_MB", "0")) * 1024 * 1024),
+    shared_bytes=document_store.total_bytes,
+)
+_sweeper_task: Optional[asyncio.Task] = None
+
+async def sweep_sessions_periodically():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            result = await run_in_threadpool(session_sweeper.sweep)
+            if result["expired"] or result["quota_evictions"]:
+                log_event("session_sweep", **result)
+        except Exception as e:
+            log_event("session_sweep_failed", level="ERROR", error=str(e))
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    global _sweeper_task
+    if SESSION_SWEEP_INTERVAL > 0:
+        _sweeper_task = asyncio.create_task(sweep_sessions_periodically())
+
+@app.on_event("shutdown")
+def shut_down_pools():
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+    # uvicorn has already drained open requests; running ingestion jobs get the same grace period
+    ingest_jobs.shutdown(drain_seconds=DRAIN_SECONDS)
+    chat_admission.shutdown()
+    _retrieval_pool.shutdown(wait=False, cancel_futures=True)
+    _batch_llm_pool.shutdown(wait=False, cancel_futures=True)
+    if _extract_pool is not None:
+        _extract_pool.shutdown(wait=False, cancel_futures=True)
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(wait=False, cancel_futures=True)
+
+# Function to read a session's metadata from disk, or None if it has none.
+# Ingestion reads it here under the session lock; request handlers use session_catalog.
+def read_session_info(session_id: str) -> Optional[Dict]:
+    session_file = SESSION_DIR / session_id / "session.json"
+    if not session_file.exists():
+        return None
+    with open(session_file, "r") as f:
+        return json.load(f)
+
+# Function to run a whole ingestion (extract, chunk, embed, index, save session); runs on the job pool.
+# In append mode only the new documents are processed and merged into the existing session.
+def ingest_documents(session_id: str, pdf_docs: List[Tuple[str, Path, str]], job: Optional[IngestJob] = None, append: bool = True) -> Dict:
+    # Document store references this job took, and whether the session's index uses them yet
+    acquired: List[str] = []
+    committed = False
+    try:
+        session_existed = read_session_info(session_id) is not None
+        # Store session information with simplified file info
+        file_info = []
+        for filename, pdf_path, sha256 in pdf_docs:
+            file_info.append({
+                "name": filename,
+                "size": pdf_path.stat().st_size,
+                "sha256": sha256,
+                "upload_date": datetime.now().isoformat()
+            })
+
+        # Extract, chunk and embed only PDFs not processed before
+        documents = prepare_documents(session_id, pdf_docs, job, acquired)
+        chunk_count = sum(len(document["metadatas"]) for document in documents)
+        text_length = sum(document["text_length"] for document in documents)
+        if not chunk_count:
+            detail = "No extractable text found in uploaded PDFs"
+            if not OCR_FALLBACK:
+                detail += " (OCR fallback for scanned pages is disabled or MinerU is not installed)"
+            raise HTTPException(status_code=400, detail=detail)
+
+        with session_write_lock(session_id):
+            # Documents were prepared outside the lock; a removal of the session in the meantime
+            # released their references and may have deleted documents only it used
+            if session_existed and read_session_info(session_id) is None:
+                raise HTTPException(status_code=409, detail="Session was deleted while the upload was processed")
+            missing = set(document_store.reacquire(session_id, [document["key"] for document in documents]))
+            for document in documents:
+                if document["key"] in missing and "chunks" in document:
+                    # Processed by this job, so it can be stored again
+                    document_store.put(
+                        document["key"], session_id, document["chunks"], document["metadatas"],
+                        document["vectors"], document["text_length"],
+                    )
+                    missing.discard(document["key"])
+            if missing:
+                raise HTTPException(
+                    status_code=409, detail="Stored documents were removed while the upload was processed; please upload again"
+                )
+            existing = read_session_info(session_id) if append else None
+            # Sessions written before index specs were recorded hold a flat index
+            existing_spec = existing.get("index", {"type": "flat", "params": {}}) if existing is not None else None
+            index_spec = get_vector_store(documents, session_id, job, existing_spec=existing_spec)
+            # The session's index on disk now points at these documents
+            committed = True
+            if not append:
+                # Documents only the replaced index used are no longer referenced by this session
+                document_store.release_session(session_id, keep=[document["key"] for document in documents])
+
+            now = datetime.now().isoformat()
+            if existing is not None:
+                session_info = existing
+                session_info["documents"] = existing.get("documents", []) + file_info
+                session_info["chunk_count"] = existing.get("chunk_count", 0) + chunk_count
+                session_info["text_length"] = existing.get("text_length", 0) + text_length
+                session_info["updated_at"] = now
+                session_info["index"] = index_spec
+            else:
+                session_info = {
+                    "created_at": now,
+                    "documents": file_info,
+                    "chunk_count": chunk_count,
+                    "text_length": text_length,
+                    "index": index_spec
+                }
+
+            # Save session to disk for persistence
+            session_file = SESSION_DIR / session_id / "session.json"
+            with open(session_file.with_suffix(".tmp"), "w") as f:
+                json.dump(session_info, f, indent=2)
+            os.replace(session_file.with_suffix(".tmp"), session_file)
+            session_catalog.upsert(session_id, session_info, size_bytes=directory_size(SESSION_DIR / session_id))
+    except BaseException:
+        # Documents the session referenced before, or that another running job took, stay referenced
+        if not committed:
+            document_store.release(session_id, acquired)
+        raise
+    finally:
+        for _, pdf_path, _ in pdf_docs:
+            remove_quietly(pdf_path)
+    
+    return {
+        "message": "Documents added to index" if existing is not None else "Index built successfully",
+        "chunk_count": chunk_count, 
+        "total_chunk_count": session_info["chunk_count"],
+        "session_id": session_id,
+        "documents": file_info,
+        "all_documents": session_info["documents"]
+    }
+
+@app.post("/extract_pdf", status_code=202)
+async def extract_pdf(files: List[UploadFile] = File(...), session_id: str = Form(None), mode: str = Form("append")):
+    """Spool uploaded PDFs and queue them for ingestion; poll /jobs/{job_id} for progress.
+
+    With an existing session_id, mode "append" (default) adds the files to the session's
+    index and "replace" rebuilds the session from these files only.
+    """
+    if mode not in ("append", "replace"):
+        raise HTTPException(status_code=400, detail="mode must be 'append' or 'replace'")
 
-@app.post("/extract_pdf")
-async def extract_pdf(files: List[UploadFile] = File(...), session_id: str = Form(None)):
     # Generate session ID if not provided
     if not session_id:
         session_id = str(uuid.uuid4())
@@ -159,104 +1145,259 @@ async def extract_pdf(files: List[UploadFile] = File(...), session_id: str = For
     if not pdf_files:
         raise HTTPException(status_code=400, detail="No PDF files uploaded")
 
-    # Extract text only from PDFs
-    raw_text = get_pdf_text(pdf_files)
-    if not raw_text.strip():
-        raise HTTPException(status_code=400, detail="No extractable text found in uploaded PDFs")
+    # Uploads are closed once this request returns, so copy them to disk before queueing the job
+    # and hash them on the way, so already-processed files can be recognised
+    pdf_docs: List[Tuple[str, Path, str]] = []
+    try:
+        for f in pdf_files:
+            hasher = hashlib.sha256()
+            with stage("spool"):
+                pdf_path = await run_in_threadpool(spool_to_file, f.file, ".pdf", hasher=hasher)
+            count("spool", pdf_path.stat().st_size, "bytes")
+            pdf_docs.append((f.filename, pdf_path, hasher.hexdigest()))
+    except Exception as e:
+        for _, pdf_path, _ in pdf_docs:
+            remove_quietly(pdf_path)
+        raise HTTPException(status_code=400, detail=f"Failed to receive uploaded files: {e}")
 
-    text_chunks = get_text_chunks(raw_text)
-    vector_store = get_vector_store(text_chunks, session_id)
-    
-    # Store session information with simplified file info
-    file_info = []
-    for f in pdf_files:
-        file_info.append({
-            "name": f.filename,
-            "size": "Unknown",  # Simplified - size isn't critical for functionality
-            "upload_date": datetime.now().isoformat()
-        })
-    
-    sessions[session_id] = {
-        "created_at": datetime.now().isoformat(),
-        "documents": file_info,
-        "chunk_count": len(text_chunks),
-        "text_length": len(raw_text)
-    }
-    
-    # Save session to disk for persistence
-    session_path = SESSION_DIR / session_id
-    session_path.mkdir(exist_ok=True)
-    with open(session_path / "session.json", "w") as f:
-        json.dump(sessions[session_id], f, indent=2)
-    
+    append = mode == "append"
+    job = ingest_jobs.submit(
+        session_id, len(pdf_docs), lambda job: ingest_documents(session_id, pdf_docs, job, append=append)
+    )
     return {
-        "message": "Index built successfully", 
-        "chunk_count": len(text_chunks), 
+        "message": "Ingestion queued",
+        "job_id": job.job_id,
         "session_id": session_id,
-        "documents": sessions[session_id]["documents"]
+        "status_url": f"/jobs/{job.job_id}",
     }
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the stage and progress of an ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 
 @app.post("/chat")
-async def chat(question: str = Form(...), session_id: str = Form(...)):
+async def chat(question: str = Form(...), session_id: str = Form(None), session_ids: List[str] = Form(None)):
     if not question or not question.strip():
         raise HTTPException(status_code=400, detail="Question must not be empty")
-    if not session_id:
-        raise HTTPException(status_code=400, detail="Session ID is required")
+    ids = resolve_session_ids(session_id, session_ids)
     
-    answer = answer_question(question, session_id)
-    return {"answer": answer}
+    result = await chat_admission.run(answer_question, question, ids)
+    return {**result, "session_ids": ids}
+
+@app.post("/chat/stream")
+async def chat_stream(question: str = Form(...), session_id: str = Form(None), session_ids: List[str] = Form(None)):
+    """Stream the answer as Server-Sent Events: token events, then sources and done"""
+    if not question or not question.strip():
+        raise HTTPException(status_code=400, detail="Question must not be empty")
+    ids = resolve_session_ids(session_id, session_ids)
+
+    # Admission and retrieval happen before the response starts so errors still get a proper status
+    def prepare():
+        entry, match, query_vector, version = lookup_cached_answer(question, ids)
+        docs = None if entry is not None else retrieve_documents(question, ids, query_vector)
+        return entry, match, query_vector, version, docs
+
+    started = await chat_admission.acquire()
+    try:
+        entry, match, query_vector, version, docs = await asyncio.get_running_loop().run_in_executor(
+            chat_admission.executor, in_context(prepare)
+        )
+    except BaseException:
+        chat_admission.release(started)
+        raise
+
+    async def events():
+        try:
+            if entry is not None:
+                yield sse_event("token", {"text": entry["answer"]})
+                sources = entry["sources"]
+            elif not docs:
+                yield sse_event("token", {"text": NO_DOCS_ANSWER})
+                sources = []
+            else:
+                context = "\n\n".join(doc.page_content for doc in docs)
+                prompt_text = get_prompt().format(context=context, question=question)
+                parts = []
+                llm_started = time.perf_counter()
+                async for chunk in get_chat_model().astream(prompt_text):
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield sse_event("token", {"text": chunk.content})
+                # Measured to the last token, after the response headers were sent
+                record("llm", time.perf_counter() - llm_started)
+                sources = describe_sources(docs)
+                if version is not None:
+                    answer_cache.put(answer_cache_key(ids), question, version, "".join(parts), sources, query_vector)
+            yield sse_event("sources", {
+                "session_id": ids[0],
+                "session_ids": ids,
+                "sources": sources,
+                "cached": entry is not None,
+                "cache_match": match,
+            })
+            yield sse_event("done", {})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            chat_admission.release(started)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/chat/batch")
+async def chat_batch(
+    questions: List[str] = Form(...),
+    session_id: str = Form(None),
+    session_ids: List[str] = Form(None),
+    stream: bool = Form(False),
+):
+    """Answer many questions against the same session(s) in one request; stream=true returns NDJSON"""
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+    ids = resolve_session_ids(session_id, session_ids)
+
+    if not stream:
+        return await chat_admission.run(answer_batch, questions, ids)
+
+    # As with /chat/stream, retrieval runs before the response starts so errors get a proper status
+    started = await chat_admission.acquire()
+    try:
+        items, batch = await asyncio.get_running_loop().run_in_executor(
+            chat_admission.executor, in_context(prepare_batch), questions, ids
+        )
+    except BaseException:
+        chat_admission.release(started)
+        raise
+
+    async def lines():
+        results = []
+        try:
+            # Waiting on LLM results happens on the thread pool, not the event loop
+            async for result in iterate_in_threadpool(run_batch(items, batch)):
+                results.append(result)
+                yield json.dumps({"type": "result", **result}) + "\n"
+            yield json.dumps({"type": "summary", "session_ids": ids, **batch_summary(results, batch)}) + "\n"
+        finally:
+            chat_admission.release(started)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@app.get("/chat/stats")
+async def chat_stats():
+    """In-flight, queued and rejected counts for /chat admission control"""
+    return chat_admission.stats()
 
 @app.get("/sessions/{session_id}")
 async def get_session(session_id: str):
     """Get session information and uploaded documents"""
-    session_path = SESSION_DIR / session_id
-    session_file = session_path / "session.json"
-    
-    if not session_file.exists():
+    session_info = await run_in_threadpool(session_catalog.get, session_id)
+    if session_info is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Load session from disk if not in memory
-    if session_id not in sessions:
-        with open(session_file, "r") as f:
-            sessions[session_id] = json.load(f)
-    
-    return sessions[session_id]
+    await run_in_threadpool(session_catalog.touch, session_id)
+    return session_info
 
 @app.get("/sessions")
-async def list_sessions():
-    """List all available sessions"""
-    session_dirs = [d for d in SESSION_DIR.iterdir() if d.is_dir()]
-    session_list = []
-    
-    for session_dir in session_dirs:
-        session_file = session_dir / "session.json"
-        if session_file.exists():
-            with open(session_file, "r") as f:
-                session_data = json.load(f)
-                session_list.append({
-                    "session_id": session_dir.name,
-                    "created_at": session_data.get("created_at"),
-                    "document_count": len(session_data.get("documents", [])),
-                    "chunk_count": session_data.get("chunk_count", 0)
-                })
-    
-    return {"sessions": session_list}
+async def list_sessions(
+    limit: int = 50,
+    offset: int = 0,
+    sort: str = "created_at",
+    order: str = "desc",
+    name: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+):
+    """List sessions from the catalog, paginated, sorted and optionally filtered"""
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    try:
+        session_list, total = await run_in_threadpool(
+            session_catalog.list, limit, offset, sort, order, name, created_after, created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"sessions": session_list, "total": total, "limit": limit, "offset": offset}
+
+# Function to remove a session from the catalog and disk; waits for any ingestion in progress.
+# With accessed_before set (the sweeper), a session used since then is kept.
+# Returns the bytes freed, including stored documents no other session uses, or None if the
+# session was not found or kept.
+def remove_session(session_id: str, accessed_before: Optional[float] = None) -> Optional[int]:
+    session_path = SESSION_DIR / session_id
+    if not session_path.exists() and session_catalog.get(session_id) is None:
+        return None
+    with session_write_lock(session_id):
+        if accessed_before is not None:
+            last_accessed = session_catalog.last_accessed(session_id)
+            if last_accessed is None or last_accessed >= accessed_before:
+                return None
+        freed = directory_size(session_path)
+        session_catalog.delete(session_id)
+        shutil.rmtree(session_path, ignore_errors=True)
+        freed += document_store.release_session(session_id)
+    index_cache.invalidate(session_id)
+    answer_cache.invalidate(session_id)
+    return freed
 
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session and its associated data"""
-    session_path = SESSION_DIR / session_id
-    
-    if not session_path.exists():
+    if await run_in_threadpool(remove_session, session_id) is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Remove from memory
-    if session_id in sessions:
-        del sessions[session_id]
-    
-    # Remove files
-    import shutil
-    shutil.rmtree(session_path)
-    
     return {"message": "Session deleted successfully"}
+
+@app.get("/storage/stats")
+async def storage_stats():
+    """Session disk usage, TTL/quota settings and what the background sweeper has reclaimed"""
+    return await run_in_threadpool(session_sweeper.stats)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss/eviction counters for the index, embedding and answer caches"""
+    return {
+        "index_cache": index_cache.stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "answer_cache": answer_cache.stats(),
+        "document_store": document_store.stats(),
+    }
+
+# Cache, document store and admission counters exported as gauges next to the stage histograms
+def component_metrics() -> List[str]:
+    components = {
+        "index_cache": index_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "document_store": document_store.stats(),
+        "chat_admission": chat_admission.stats(),
+    }
+    # Scrapes do not open the embedding cache (and import langchain) before ingestion does
+    if _embedding_cache is not None:
+        components["embedding_cache"] = _embedding_cache.stats()
+    values = {
+        (("component", component), ("stat", name)): value
+        for component, stats in components.items()
+        for name, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+    return gauge_lines("pdf_chat_component", "Cache, document store and admission counters", values)
+
+add_collector(component_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics of this worker process: stage and request latency histograms, cache counters"""
+    text = await run_in_threadpool(render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+# Time spent importing this module, reported at startup
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
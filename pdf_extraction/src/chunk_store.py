@@ -0,0 +1,197 @@
+"""
+Lazy on-disk chunk store
+
+Chunk texts and metadata live in a per-session SQLite file (``chunks.sqlite``)
+keyed by the chunk's position in the FAISS index. A search reads only the k rows
+it returns, so opening a session no longer deserializes every chunk, and the
+request path never unpickles anything. Sessions saved with LangChain's pickled
+``index.pkl`` are converted once at startup (``convert_legacy_sessions``); the
+request path refuses a session that still has only the pickle.
+
+A row may hold its text inline or point at a chunk of a document in the shared
+document store (``doc_key``, ``doc_position``), so documents uploaded to several
+sessions keep their texts once.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+CHUNKS_FILE = "chunks.sqlite"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS chunks ("
+        " position INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT, doc_key TEXT, doc_position INTEGER)"
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(chunks)")}
+    if "doc_key" not in columns:
+        conn.execute("ALTER TABLE chunks ADD COLUMN doc_key TEXT")
+        conn.execute("ALTER TABLE chunks ADD COLUMN doc_position INTEGER")
+    return conn
+
+
+def write_chunks(
+    path: Path,
+    start: int,
+    texts: List[str],
+    metadatas: Optional[List[Dict[str, Any]]] = None,
+    refs: Optional[List[Tuple[str, int]]] = None,
+) -> None:
+    """Store chunks at positions ``start``, ``start + 1``, ... in one transaction.
+
+    With ``refs`` (``(doc_key, doc_position)`` per chunk) the texts live in the
+    document store and ``texts`` may be empty strings.
+    """
+    metadatas = metadatas or [{} for _ in texts]
+    refs = refs or [(None, None) for _ in texts]
+    rows = (
+        (start + offset, text, json.dumps(metadata) if metadata else None, doc_key, doc_position)
+        for offset, (text, metadata, (doc_key, doc_position)) in enumerate(zip(texts, metadatas, refs))
+    )
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR REPLACE INTO chunks (position, text, metadata, doc_key, doc_position) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+class LegacyChunkStoreError(RuntimeError):
+    """The session still has only a pickled docstore, which requests never unpickle."""
+
+
+def ensure_chunk_store(index_dir: Path) -> Path:
+    """Return the path of the session's chunk store.
+
+    Raises LegacyChunkStoreError for a session whose pickled docstore has not
+    been converted yet.
+    """
+    chunks_path = index_dir / CHUNKS_FILE
+    if not chunks_path.exists() and (index_dir / LEGACY_DOCSTORE_FILE).exists():
+        raise LegacyChunkStoreError(
+            f"{index_dir} has only a legacy {LEGACY_DOCSTORE_FILE}; it is converted when the server starts"
+        )
+    return chunks_path
+
+
+def convert_legacy_docstore(index_dir: Path) -> bool:
+    """Convert a session's pickled docstore into a chunk store; returns whether it did.
+
+    Runs at startup only, never on a request.
+    """
+    chunks_path = index_dir / CHUNKS_FILE
+    legacy_path = index_dir / LEGACY_DOCSTORE_FILE
+    if chunks_path.exists():
+        return False
+
+    # One-time conversion of a file this service wrote itself
+    try:
+        with open(legacy_path, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    except FileNotFoundError:
+        # Nothing to convert, or another worker has just converted it
+        return False
+    positions = sorted(index_to_docstore_id)
+    texts, metadatas = [], []
+    for position in positions:
+        doc = docstore.search(index_to_docstore_id[position])
+        texts.append(doc.page_content)
+        metadatas.append(doc.metadata)
+
+    # Workers starting together may both convert; each writes its own temp file and the last rename wins
+    tmp_path = chunks_path.with_name(f"{CHUNKS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write_chunks(tmp_path, 0, texts, metadatas)
+    os.replace(tmp_path, chunks_path)
+    try:
+        os.remove(legacy_path)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def convert_legacy_sessions(session_dir: Path) -> Tuple[int, List[str]]:
+    """Convert every session under ``session_dir`` still holding a pickled docstore.
+
+    Returns the number converted and the errors of those that failed.
+    """
+    converted, errors = 0, []
+    for legacy_path in Path(session_dir).glob(f"*/faiss_index/{LEGACY_DOCSTORE_FILE}"):
+        try:
+            converted += convert_legacy_docstore(legacy_path.parent)
+        except Exception as e:
+            errors.append(f"{legacy_path.parent.parent.name}: {e}")
+    return converted, errors
+
+
+class SqliteDocstore(Docstore):
+    """Read-only docstore that fetches chunks from SQLite by index position.
+
+    The connection is opened up front, so a reader keeps seeing the file it
+    opened even if a rebuild swaps a new one into place. Rows that reference
+    the shared document store are resolved through ``documents_path``.
+    """
+
+    def __init__(self, path: Path, documents_path: Optional[Path] = None):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+        if "doc_key" in columns and documents_path is not None and Path(documents_path).exists():
+            self._conn.execute("ATTACH DATABASE ? AS shared", (f"file:{documents_path}?mode=ro",))
+            self._query = (
+                "SELECT COALESCE(d.text, c.text), c.metadata FROM chunks c"
+                " LEFT JOIN shared.document_chunks d ON d.doc_key = c.doc_key AND d.position = c.doc_position"
+                " WHERE c.position = ?"
+            )
+        else:
+            self._query = "SELECT text, metadata FROM chunks WHERE position = ?"
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(self._query, (int(search),)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        text, metadata = row
+        return Document(page_content=text, metadata=json.loads(metadata) if metadata else {})
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __del__(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+
+class PositionalIds(Mapping):
+    """``index_to_docstore_id`` for stores whose docstore ids are index positions."""
+
+    def __init__(self, size: int):
+        self._size = size
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self._size:
+            raise KeyError(position)
+        return str(position)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._size))
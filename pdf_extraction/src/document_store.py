@@ -0,0 +1,291 @@
+"""
+Shared document store
+
+Uploaded PDFs are identified by the sha256 of their bytes, computed while they
+are spooled. Together with the extraction and chunking settings and the
+embedding model, that hash keys a document here. The store keeps the
+document's chunk texts and its vector matrix once, for all sessions. A repeated
+upload of the same file skips extraction, chunking and embedding. Its vectors
+come from here and the session's chunk store points at the stored texts instead
+of copying them.
+
+Sessions register the documents they use. Each reference counts the
+ingestions that took it, so an ingestion that fails can give back exactly its
+own uses (``release``) without disturbing another one in flight. A document is
+deleted as soon as no session references it any more. Each document records the bytes it takes, so
+the session disk quota can count the store and a session removal can report
+what it freed.
+
+Sessions read their chunk texts from here, so the store is session data, not
+a cache: it lives next to the sessions and must not be deleted on its own.
+"""
+
+import hashlib
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def move_store(old_path: Path, new_path: Path) -> None:
+    """Move a store left at ``old_path`` (with its WAL files) to ``new_path`` unless one is there already."""
+    old_path, new_path = Path(old_path), Path(new_path)
+    if new_path.exists() or not old_path.exists():
+        return
+    new_path.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("-wal", "-shm", ""):
+        source = Path(str(old_path) + suffix)
+        if source.exists():
+            shutil.move(str(source), str(new_path) + suffix)
+
+
+def document_key(file_sha256: str, *settings: Any) -> str:
+    """Key for a file processed with the given extraction/chunking/embedding settings."""
+    fingerprint = ":".join([file_sha256, *(str(setting) for setting in settings)])
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+class DocumentStore:
+    """SQLite store of per-document chunk texts and vectors, reference-counted by session."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_key TEXT PRIMARY KEY,"
+            " chunk_count INTEGER NOT NULL,"
+            " text_length INTEGER NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vectors BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " size_bytes INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS document_chunks ("
+            " doc_key TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " metadata TEXT,"
+            " PRIMARY KEY (doc_key, position))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS document_refs ("
+            " doc_key TEXT NOT NULL,"
+            " session_id TEXT NOT NULL,"
+            " uses INTEGER NOT NULL DEFAULT 1,"
+            " PRIMARY KEY (doc_key, session_id))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS document_refs_session ON document_refs (session_id)")
+        self._migrate()
+        self.reused = 0
+        self.stored = 0
+        self.removed = 0
+
+    def _migrate(self) -> None:
+        # Stores written by older versions get the newer columns; checked inside the
+        # transaction because every worker opens the store at startup
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if "size_bytes" not in self._columns("documents"):
+                # Sizes were not recorded; measure them once
+                self._conn.execute("ALTER TABLE documents ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute(
+                    "UPDATE documents SET size_bytes = LENGTH(vectors) + ("
+                    " SELECT COALESCE(SUM(LENGTH(CAST(text AS BLOB)) + COALESCE(LENGTH(metadata), 0)), 0)"
+                    " FROM document_chunks WHERE document_chunks.doc_key = documents.doc_key)"
+                )
+            if "uses" not in self._columns("document_refs"):
+                self._conn.execute("ALTER TABLE document_refs ADD COLUMN uses INTEGER NOT NULL DEFAULT 1")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _columns(self, table: str) -> List[str]:
+        return [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+
+    def _add_ref_locked(self, doc_key: str, session_id: str) -> None:
+        self._conn.execute(
+            "INSERT INTO document_refs (doc_key, session_id) VALUES (?, ?)"
+            " ON CONFLICT (doc_key, session_id) DO UPDATE SET uses = uses + 1",
+            (doc_key, session_id),
+        )
+
+    def _remove_orphans_locked(self) -> int:
+        orphans = self._conn.execute(
+            "SELECT doc_key, size_bytes FROM documents WHERE doc_key NOT IN (SELECT doc_key FROM document_refs)"
+        ).fetchall()
+        for doc_key, _ in orphans:
+            self._conn.execute("DELETE FROM document_chunks WHERE doc_key = ?", (doc_key,))
+            self._conn.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,))
+        self.removed += len(orphans)
+        return sum(size for _, size in orphans)
+
+    def acquire(self, doc_key: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Reference a stored document from ``session_id`` and return its vectors,
+        per-chunk metadata and text length; None if it is not stored.
+
+        Taking the reference in the same transaction as the lookup keeps the
+        document from being released by another session in between.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT chunk_count, text_length, dim, vectors FROM documents WHERE doc_key = ?", (doc_key,)
+                ).fetchone()
+                metadatas = []
+                if row is not None:
+                    self._add_ref_locked(doc_key, session_id)
+                    metadatas = [
+                        json.loads(metadata) if metadata else {}
+                        for (metadata,) in self._conn.execute(
+                            "SELECT metadata FROM document_chunks WHERE doc_key = ? ORDER BY position", (doc_key,)
+                        )
+                    ]
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if row is None:
+                return None
+            self.reused += 1
+        chunk_count, text_length, dim, blob = row
+        vectors = np.frombuffer(blob, dtype=np.float32).reshape(chunk_count, dim)
+        return {"chunk_count": chunk_count, "text_length": text_length, "vectors": vectors, "metadatas": metadatas}
+
+    def put(
+        self,
+        doc_key: str,
+        session_id: str,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]],
+        vectors: np.ndarray,
+        text_length: int,
+    ) -> None:
+        """Store a newly processed document (first writer wins) and reference it from ``session_id``."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        rows = [
+            (doc_key, position, text, json.dumps(metadata) if metadata else None)
+            for position, (text, metadata) in enumerate(zip(texts, metadatas))
+        ]
+        size_bytes = vectors.nbytes + sum(len(row[2].encode("utf-8")) + len(row[3] or "") for row in rows)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO documents"
+                    " (doc_key, chunk_count, text_length, dim, vectors, created_at, size_bytes)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_key, len(texts), text_length, vectors.shape[1], vectors.tobytes(), time.time(), size_bytes),
+                ).rowcount
+                if inserted:
+                    self._conn.executemany(
+                        "INSERT INTO document_chunks (doc_key, position, text, metadata) VALUES (?, ?, ?, ?)", rows
+                    )
+                self._add_ref_locked(doc_key, session_id)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.stored += inserted
+
+    def release_session(self, session_id: str, keep: Optional[List[str]] = None) -> int:
+        """Drop ``session_id``'s references except those in ``keep``.
+
+        Returns the bytes of the documents that were removed because no session
+        references them any more.
+        """
+        keep = list(keep or [])
+        marks = ",".join("?" * len(keep))
+        exclude = f" AND doc_key NOT IN ({marks})" if keep else ""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(f"DELETE FROM document_refs WHERE session_id = ?{exclude}", [session_id, *keep])
+                freed = self._remove_orphans_locked()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return freed
+
+    def reacquire(self, session_id: str, doc_keys: List[str]) -> List[str]:
+        """Make sure ``session_id`` still references each stored document in ``doc_keys``.
+
+        A removal of the session while it was being ingested drops its
+        references and may delete documents that only it used. References that
+        were dropped are taken again; the keys of documents no longer stored are
+        returned.
+        """
+        missing = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_key in doc_keys:
+                    if self._conn.execute("SELECT 1 FROM documents WHERE doc_key = ?", (doc_key,)).fetchone() is None:
+                        missing.append(doc_key)
+                        continue
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO document_refs (doc_key, session_id) VALUES (?, ?)", (doc_key, session_id)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return missing
+
+    def release(self, session_id: str, doc_keys: List[str]) -> int:
+        """Give back one use of each key in ``doc_keys`` (as taken by ``acquire``/``put``).
+
+        For an ingestion that failed before its session referenced the documents.
+        A reference is dropped when its last use is given back, so uses taken by
+        earlier ingestions or by one still running keep the document. Returns
+        the bytes of documents removed because nothing references them any more.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_key in doc_keys:
+                    self._conn.execute(
+                        "UPDATE document_refs SET uses = uses - 1 WHERE doc_key = ? AND session_id = ?",
+                        (doc_key, session_id),
+                    )
+                self._conn.execute("DELETE FROM document_refs WHERE session_id = ? AND uses <= 0", (session_id,))
+                freed = self._remove_orphans_locked()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return freed
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            documents, vector_bytes, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vectors)), 0), COALESCE(SUM(size_bytes), 0) FROM documents"
+            ).fetchone()
+            references = self._conn.execute("SELECT COUNT(*) FROM document_refs").fetchone()[0]
+            return {
+                "documents": documents,
+                "references": references,
+                "vector_bytes": vector_bytes,
+                "bytes": total_bytes,
+                "reused": self.reused,
+                "stored": self.stored,
+                "removed": self.removed,
+            }
@@ -0,0 +1,93 @@
+"""
+Batched embedding pipeline
+
+Splits document embedding into fixed-size batches that are sent with bounded
+concurrency, paced by a shared request-rate limit, and retried with exponential
+backoff. A transient API error therefore costs one batch retry instead of the
+whole upload.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class RateLimiter:
+    """Spaces calls evenly so that at most ``per_minute`` start in any minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeds documents in concurrent, individually retried batches."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        rate_limiter: Optional[RateLimiter] = None,
+        progress: Optional[Callable[[int], None]] = None,
+    ):
+        self.underlying = underlying
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+        self.progress = progress
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                vectors = self.underlying.embed_documents(texts)
+            except Exception:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                # Full jitter keeps concurrent batches from retrying in lockstep
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                time.sleep(random.uniform(0, delay))
+                continue
+            if self.progress is not None:
+                self.progress(len(texts))
+            return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1 or self.max_concurrency == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            workers = min(self.max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+                # map preserves batch order, so vectors line up with the input texts
+                results = list(pool.map(self._embed_batch, batches))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
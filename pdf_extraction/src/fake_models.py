@@ -0,0 +1,95 @@
+"""
+Local model stand-ins
+
+Used by the ``fake`` backend (see model_backends.py) for benchmarks and offline
+development. ``HashingEmbeddings`` hashes words into a fixed-size vector, so the
+same text always gets the same vector and texts that share words are close to
+each other. ``FakeChatModel`` waits a configurable latency and answers with the
+opening words of the retrieved context, streaming them at a configurable rate.
+"""
+
+import asyncio
+import hashlib
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_WORD = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings (feature hashing), L2-normalized."""
+
+    def __init__(self, dim: int = 768, latency: float = 0.0):
+        self.dim = dim
+        # Seconds per embedding request, to mimic an API round trip
+        self.latency = latency
+        self.model = f"fake-hashing-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers after ``latency`` seconds with the first words of the context."""
+
+    latency: float = 0.5
+    answer_words: int = 60
+    # 0 sends the whole answer at once
+    words_per_second: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer_words(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = str(messages[-1].content) if messages else ""
+        # The QA prompt puts the retrieved chunks between "Context:" and "Question:"
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0]
+        words = context.split()[: self.answer_words]
+        return words or ["No", "context", "was", "provided."]
+
+    def _word_delay(self) -> float:
+        return 1.0 / self.words_per_second if self.words_per_second > 0 else 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        words = self._answer_words(messages)
+        time.sleep(self.latency + self._word_delay() * len(words))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(words)))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, word in enumerate(self._answer_words(messages)):
+            time.sleep(self._word_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        # Sleeps on the event loop, so concurrent streams do not hold threads
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(self._answer_words(messages)):
+            await asyncio.sleep(self._word_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
@@ -0,0 +1,133 @@
+"""
+Size-adaptive FAISS index construction
+
+Picks the FAISS index type for a session from its vector count: exact flat
+search for small sessions, HNSW graphs for mid-sized ones and IVF with product
+or scalar quantization for very large ones. Search latency stays sub-linear and
+memory stays bounded. The chosen spec is recorded in session metadata.
+
+Indexes are read back memory-mapped and read-only where the installed faiss
+supports it, so their pages live in the shared OS page cache rather than in
+each worker's heap.
+"""
+
+import math
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+FLAT_MAX_VECTORS = 10_000
+HNSW_MAX_VECTORS = 200_000
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # About one 8-bit code per 8 dimensions; PQ needs m to divide dim
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def choose_index_spec(
+    vector_count: int,
+    dim: int,
+    flat_max: int = FLAT_MAX_VECTORS,
+    hnsw_max: int = HNSW_MAX_VECTORS,
+    large_type: str = "ivfpq",
+) -> Dict[str, Any]:
+    """Return ``{"type": ..., "params": {...}}`` for an index holding ``vector_count`` vectors."""
+    if vector_count < flat_max:
+        return {"type": "flat", "params": {}}
+    if vector_count < hnsw_max:
+        return {"type": "hnsw", "params": {"M": 32, "efConstruction": 200, "efSearch": 64}}
+    # ~4*sqrt(n) lists, but never fewer than the ~39 training points per centroid faiss wants
+    nlist = max(1, min(int(4 * math.sqrt(vector_count)), vector_count // 39))
+    if large_type == "ivfsq8":
+        return {"type": "ivfsq8", "params": {"nlist": nlist, "nprobe": 16}}
+    return {"type": "ivfpq", "params": {"nlist": nlist, "m": _pq_subquantizers(dim), "nbits": 8, "nprobe": 16}}
+
+
+def build_index(vectors: np.ndarray, spec: Dict[str, Any]) -> "faiss.Index":
+    """Create, train if needed, and fill an index of the given spec."""
+    dim = vectors.shape[1]
+    params = spec["params"]
+    if spec["type"] == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif spec["type"] == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"])
+        index.hnsw.efConstruction = params["efConstruction"]
+    else:
+        quantizer = faiss.IndexFlatL2(dim)
+        if spec["type"] == "ivfsq8":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, params["nlist"], faiss.ScalarQuantizer.QT_8bit)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, params["nlist"], params["m"], params["nbits"])
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index, spec)
+    return index
+
+
+def apply_search_params(index: "faiss.Index", spec: Optional[Dict[str, Any]]) -> None:
+    if not spec:
+        return
+    params = spec.get("params", {})
+    if spec.get("type") == "hnsw" and "efSearch" in params:
+        index.hnsw.efSearch = params["efSearch"]
+    elif "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+
+
+def read_index_mapped(path: Path) -> Tuple["faiss.Index", bool]:
+    """Open a saved index memory-mapped and read-only; returns ``(index, mapped)``.
+
+    faiss accepts the mmap flags for every index type but ignores them where it
+    cannot map, so ``mapped`` is decided by what was loaded. Flat and HNSW code
+    arrays are mapped only with IO_FLAG_MMAP_IFC (faiss >= 1.8). IVF indexes are
+    mapped only with on-disk inverted lists; array inverted lists are read into
+    memory. An unmapped index is a private copy and is charged to the cache in full.
+    """
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    flags |= getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    try:
+        index = faiss.read_index(str(path), flags)
+    except RuntimeError:
+        return faiss.read_index(str(path)), False
+    return index, _is_mapped(index)
+
+
+def _is_mapped(index: "faiss.Index") -> bool:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return isinstance(faiss.downcast_InvertedLists(ivf.invlists), faiss.OnDiskInvertedLists)
+    return hasattr(faiss, "IO_FLAG_MMAP_IFC")
+
+
+def index_type(index: "faiss.Index") -> str:
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVFScalarQuantizer):
+        return "ivfsq8"
+    return "flat"
+
+
+def reconstruct_all(index: "faiss.Index") -> np.ndarray:
+    """Return the stored vectors (approximations for quantized indexes)."""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def extend_index(index: "faiss.Index", vectors: np.ndarray, target_spec: Dict[str, Any]) -> Tuple["faiss.Index", bool]:
+    """Add ``vectors`` to a writable ``index``, rebuilding it if the new size calls for another type.
+
+    Vector positions are preserved either way. Returns ``(index, rebuilt)``.
+    """
+    index.add(vectors)
+    if index_type(index) == target_spec["type"]:
+        return index, False
+    return build_index(reconstruct_all(index), target_spec), True
@@ -0,0 +1,101 @@
+"""
+Session index cache
+
+Keeps loaded FAISS vector stores in memory between /chat requests so a session's
+index is read from disk once per worker instead of once per question. Entries are
+evicted least-recently-used first once either the entry limit or the approximate
+resident size limit is exceeded. Each entry remembers the on-disk version it was
+loaded from, so an index rebuilt by another worker process is reloaded too.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class VectorStoreCache:
+    """Process-wide LRU cache of loaded vector stores keyed by session id."""
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 1024 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key: str, loader: Callable[[], Tuple[Any, int]], version: Any = None) -> Any:
+        """Return the cached value for ``key`` or build it with ``loader``.
+
+        ``loader`` returns ``(value, approximate_size_in_bytes)``. It runs outside
+        the cache lock so a slow disk load does not block hits on other sessions.
+        A cached entry whose ``version`` differs from the requested one is stale
+        and is loaded again.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generations.get(key, 0)
+
+        value, size = loader()
+
+        with self._lock:
+            # The session was rebuilt or deleted while we were loading it;
+            # hand the value to this caller but do not cache a stale copy.
+            if self._generations.get(key, 0) != generation:
+                return value
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self._bytes -= existing[1]
+            self._entries[key] = (value, size, version)
+            self._bytes += size
+            self._evict_locked()
+        return value
+
+    def invalidate(self, key: str) -> None:
+        """Drop ``key`` and make any in-flight load for it uncacheable."""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in self._entries:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict_locked(self) -> None:
+        # Always keep the most recent entry, even if it alone exceeds max_bytes.
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+            }
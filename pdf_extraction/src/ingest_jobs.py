@@ -0,0 +1,258 @@
+"""
+Background ingestion jobs
+
+/extract_pdf hands the spooled uploads to a job that runs on a bounded thread
+pool, so extraction and embedding never run on the event loop. With a slot
+directory, ``max_concurrency`` is one limit for all worker processes sharing it:
+a job stays queued until it holds one of the ``ProcessSlots`` lock files. Job
+state is kept in memory and mirrored to a small JSON file so any worker can
+answer a status poll.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(fh: IO[bytes]) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fh: IO[bytes]) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ProcessSlots:
+    """At most ``count`` holders at once across every process sharing ``slot_dir``.
+
+    Each slot is a lock file and holding its OS lock is holding the slot, so the
+    slots of a worker that dies are freed with its process.
+    """
+
+    def __init__(self, slot_dir: Path, count: int, poll_interval: float = 0.5):
+        self.slot_dir = Path(slot_dir)
+        self.slot_dir.mkdir(parents=True, exist_ok=True)
+        self.count = max(1, count)
+        self.poll_interval = poll_interval
+        self._closed = threading.Event()
+
+    @contextmanager
+    def hold(self) -> Iterator[int]:
+        """Wait for a free slot and hold it for the block; yields the slot number."""
+        while True:
+            for slot in range(self.count):
+                fh = open(self.slot_dir / f"slot-{slot}.lock", "a+b")
+                if not _try_lock(fh):
+                    fh.close()
+                    continue
+                try:
+                    yield slot
+                finally:
+                    _unlock(fh)
+                    fh.close()
+                return
+            if self._closed.wait(self.poll_interval):
+                raise RuntimeError("Server shut down before the job started; please upload again")
+
+    def close(self) -> None:
+        """Make waiting holders give up, so a shutdown is not held up by queued jobs."""
+        self._closed.set()
+
+
+class IngestJob:
+    """Progress of one /extract_pdf upload.
+
+    ``stage`` moves through queued, extracting, chunking, embedding and indexing
+    to either completed or failed.
+    """
+
+    # Write the on-disk snapshot at most this often while counters change
+    SNAPSHOT_INTERVAL = 1.0
+
+    def __init__(self, job_id: str, session_id: str, document_count: int, job_dir: Path):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.document_count = document_count
+        self.stage = "queued"
+        self.pages_processed = 0
+        self.chunk_count = 0
+        self.chunks_embedded = 0
+        self.error: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._path = job_dir / f"{job_id}.json"
+        self._lock = threading.Lock()
+        self._last_snapshot = 0.0
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ("completed", "failed")
+
+    def set_stage(self, stage: str) -> None:
+        with self._lock:
+            self.stage = stage
+            self._touch_locked(force=True)
+
+    def add_pages(self, count: int = 1) -> None:
+        with self._lock:
+            self.pages_processed += count
+            self._touch_locked()
+
+    def add_chunks(self, count: int) -> None:
+        with self._lock:
+            self.chunk_count += count
+            self._touch_locked()
+
+    def add_embedded(self, count: int) -> None:
+        with self._lock:
+            self.chunks_embedded += count
+            self._touch_locked()
+
+    def complete(self, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self.result = result
+            self.stage = "completed"
+            self._touch_locked(force=True)
+
+    def fail(self, error: str) -> None:
+        with self._lock:
+            self.error = error
+            self.stage = "failed"
+            self._touch_locked(force=True)
+
+    def _touch_locked(self, force: bool = False) -> None:
+        self.updated_at = time.time()
+        if force or self.updated_at - self._last_snapshot >= self.SNAPSHOT_INTERVAL:
+            self._last_snapshot = self.updated_at
+            tmp = self._path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump(self._to_dict_locked(), f)
+            os.replace(tmp, self._path)
+
+    def _to_dict_locked(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "status": self.stage if self.done or self.stage == "queued" else "running",
+            "stage": self.stage,
+            "document_count": self.document_count,
+            "pages_processed": self.pages_processed,
+            "chunk_count": self.chunk_count,
+            "chunks_embedded": self.chunks_embedded,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._to_dict_locked()
+
+
+class IngestJobManager:
+    """Runs ingestion jobs on a bounded pool and keeps their status.
+
+    Without ``slot_dir`` the limit applies to this process only.
+    """
+
+    def __init__(
+        self,
+        job_dir: Path,
+        max_concurrency: int = 2,
+        retention_seconds: float = 3600,
+        slot_dir: Optional[Path] = None,
+    ):
+        self.job_dir = Path(job_dir)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+        self.retention_seconds = retention_seconds
+        self._slots = ProcessSlots(slot_dir, max_concurrency) if slot_dir is not None else None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestJob] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session_id: str, document_count: int, work: Callable[[IngestJob], Dict[str, Any]]) -> IngestJob:
+        job = IngestJob(str(uuid.uuid4()), session_id, document_count, self.job_dir)
+        job.set_stage("queued")
+        with self._lock:
+            self._prune_locked()
+            self._jobs[job.job_id] = job
+            self._futures[job.job_id] = self._executor.submit(self._run, job, work)
+        return job
+
+    def _run(self, job: IngestJob, work: Callable[[IngestJob], Dict[str, Any]]) -> None:
+        try:
+            with self._slots.hold() if self._slots is not None else nullcontext():
+                job.complete(work(job))
+        except Exception as e:
+            job.fail(str(getattr(e, "detail", None) or e))
+        finally:
+            with self._lock:
+                self._futures.pop(job.job_id, None)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        # Submitted to another worker process; fall back to its snapshot
+        path = self.job_dir / f"{job_id}.json"
+        if path.exists():
+            with open(path, "r") as f:
+                return json.load(f)
+        return None
+
+    def _prune_locked(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j for j, job in self._jobs.items() if job.done and job.updated_at < cutoff]:
+            del self._jobs[job_id]
+            try:
+                os.remove(self.job_dir / f"{job_id}.json")
+            except OSError:
+                pass
+
+    def shutdown(self, drain_seconds: float = 0) -> None:
+        """Stop taking jobs and wait up to ``drain_seconds`` for running ones to finish.
+
+        Jobs that had not started are marked failed, so clients polling them see
+        them end instead of staying queued.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._slots is not None:
+            self._slots.close()
+        with self._lock:
+            futures = dict(self._futures)
+        running = []
+        for job_id, future in futures.items():
+            if future.cancelled():
+                self._jobs[job_id].fail("Server shut down before the job started; please upload again")
+            else:
+                running.append(future)
+        if running and drain_seconds > 0:
+            wait(running, timeout=drain_seconds)
@@ -0,0 +1,45 @@
+"""
+Deferred module imports
+
+langchain, FAISS, PyPDF2, python-pptx and the Google SDKs take seconds to
+import, but only ingestion and answering use them. ``LazyModule`` stands in for
+a module and imports it on first attribute access. A worker can therefore start
+serving requests that do not need them, such as session listing, job status and
+stats, before any of them is loaded. ``load_times`` reports how long each
+deferred import took once it happened.
+"""
+
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+_load_seconds: Dict[str, float] = {}
+
+
+class LazyModule:
+    """Proxy for module ``name`` (relative to ``package`` if given), imported on first use."""
+
+    def __init__(self, name: str, package: Optional[str] = None):
+        self._name = f"{package}.{name}" if package else name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    _load_seconds[self._name] = round(time.perf_counter() - started, 4)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+
+def load_times() -> Dict[str, float]:
+    """Seconds spent importing each deferred module so far."""
+    return dict(_load_seconds)
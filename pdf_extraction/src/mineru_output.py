@@ -0,0 +1,158 @@
+"""
+MinerU output as an ingestion source
+
+``run_extractor.py`` parses PDFs offline with MinerU and writes ``<name>.md`` and
+``<name>_content_list.json`` per document. It also records each source PDF's
+sha256 under ``<output_dir>/.by_hash/``, so the chat API can recognise an
+uploaded file it has already parsed and index the structured output instead of
+re-extracting raw text. Content-list blocks are grouped into chunks that keep
+their page range and note which tables and equations they contain.
+
+Nothing here imports MinerU; reading its output only needs the JSON files.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+HASH_INDEX_DIR = ".by_hash"
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+_CELL_END = re.compile(r"</t[dh]\s*>", re.IGNORECASE)
+_ROW_END = re.compile(r"</tr\s*>", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def register_output(output_dir: Path, sha256: str, name: str, document_dir: Path) -> None:
+    """Record that the PDF with this hash was parsed into ``document_dir``."""
+    output_dir = Path(output_dir)
+    index_dir = output_dir / HASH_INDEX_DIR
+    index_dir.mkdir(parents=True, exist_ok=True)
+    entry = {"name": name, "dir": os.path.relpath(document_dir, output_dir)}
+    tmp_path = index_dir / f"{sha256}.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, index_dir / f"{sha256}.json")
+
+
+def find_output(output_dir: Path, sha256: str) -> Optional[Tuple[Path, Path]]:
+    """Return ``(content_list_path, markdown_path)`` for a parsed PDF; either may not exist.
+
+    None if the hash was never registered or its output has since been removed.
+    """
+    output_dir = Path(output_dir)
+    try:
+        with open(output_dir / HASH_INDEX_DIR / f"{sha256}.json", "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    document_dir = output_dir / entry["dir"]
+    content_list = document_dir / f"{entry['name']}_content_list.json"
+    markdown = document_dir / f"{entry['name']}.md"
+    if not content_list.exists() and not markdown.exists():
+        return None
+    return content_list, markdown
+
+
+def table_to_text(table_html: str) -> str:
+    """Flatten MinerU's HTML table body into ``cell | cell`` rows."""
+    text = _ROW_END.sub("\n", _CELL_END.sub(" | ", table_html))
+    rows = (html.unescape(_TAG.sub("", row)).strip().rstrip("|").strip() for row in text.split("\n"))
+    return "\n".join(row for row in rows if row)
+
+
+def iter_content_blocks(content_list: List[Dict[str, Any]]) -> Iterator[Tuple[str, str, int]]:
+    """Yield ``(kind, text, page)`` for every content-list block that carries text."""
+    for block in content_list:
+        kind = block.get("type", "text")
+        page = block.get("page_idx", 0) + 1
+        if kind == "table":
+            parts = block.get("table_caption", []) + [table_to_text(block.get("table_body", ""))]
+            parts += block.get("table_footnote", [])
+            text = "\n".join(part for part in parts if part)
+        elif kind == "image":
+            text = "\n".join(block.get("img_caption", []) + block.get("img_footnote", []))
+        elif kind == "equation":
+            text = block.get("text", "")
+        else:
+            text = block.get("text", "")
+            level = block.get("text_level")
+            if level and text:
+                text = f"{'#' * level} {text}"
+        if text.strip():
+            yield kind, text.strip(), page
+
+
+def chunk_content_list(
+    content_list_path: Path, splitter, chunk_size: int, source: str
+) -> Tuple[List[str], List[Dict[str, Any]], int, int]:
+    """Group content blocks into chunks of at most ``chunk_size`` characters.
+
+    Blocks are never split unless a single block is larger than a chunk.
+    Returns ``(texts, metadatas, text_length, page_count)``.
+    """
+    with open(content_list_path, "r", encoding="utf-8") as f:
+        content_list = json.load(f)
+
+    texts: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    parts: List[str] = []
+    kinds: List[str] = []
+    pages: List[int] = []
+    text_length = 0
+    last_page = 0
+
+    def flush():
+        if not parts:
+            return
+        texts.append("\n\n".join(parts))
+        metadatas.append({
+            "source": source,
+            "extraction": "mineru",
+            "page_start": min(pages),
+            "page_end": max(pages),
+            "tables": kinds.count("table"),
+            "equations": kinds.count("equation"),
+        })
+        parts.clear()
+        kinds.clear()
+        pages.clear()
+
+    for kind, text, page in iter_content_blocks(content_list):
+        text_length += len(text)
+        last_page = max(last_page, page)
+        if len(text) > chunk_size:
+            flush()
+            for piece in splitter.split_text(text):
+                parts.append(piece)
+                kinds.append(kind)
+                pages.append(page)
+                flush()
+            continue
+        if parts and sum(len(part) + 2 for part in parts) + len(text) > chunk_size:
+            flush()
+        parts.append(text)
+        kinds.append(kind)
+        pages.append(page)
+    flush()
+    return texts, metadatas, text_length, last_page
+
+
+def chunk_markdown(markdown_path: Path, splitter, source: str) -> Tuple[List[str], List[Dict[str, Any]], int]:
+    """Chunks of a MinerU ``.md`` file, for output written without a content list (no page numbers)."""
+    with open(markdown_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    texts = splitter.split_text(text)
+    return texts, [{"source": source, "extraction": "mineru"} for _ in texts], len(text)
@@ -0,0 +1,79 @@
+"""
+Embedding and chat model backends
+
+``create_embeddings`` and ``create_chat_model`` build the models the API uses,
+selected by backend name:
+
+- ``google``: Gemini embeddings and chat through langchain-google-genai (needs
+  ``GOOGLE_API_KEY``).
+- ``fake``: the local stand-ins in fake_models.py, for benchmarks and offline
+  development.
+
+Backend packages are imported by the factories, not here, so choosing a
+backend at startup loads nothing.
+"""
+
+import os
+import threading
+from typing import Any, Optional
+
+BACKENDS = ("google", "fake")
+GOOGLE_EMBEDDING_MODEL = "models/embedding-001"
+GOOGLE_CHAT_MODEL = "gemini-2.0-flash"
+
+_google_configured = False
+_google_lock = threading.Lock()
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}'; expected one of {', '.join(BACKENDS)}")
+
+
+def embedding_model_name(backend: str, fake_dim: int = 768) -> str:
+    """Model identifier recorded with cached embeddings and stored documents."""
+    _check_backend(backend)
+    return GOOGLE_EMBEDDING_MODEL if backend == "google" else f"fake-hashing-{fake_dim}"
+
+
+def require_google_key(api_key: Optional[str]) -> None:
+    """Fail at startup, not on the first request, if the Google backend has no key."""
+    if not api_key:
+        raise RuntimeError("GOOGLE_API_KEY is not set in environment")
+
+
+def _configure_google() -> None:
+    global _google_configured
+    with _google_lock:
+        if not _google_configured:
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _google_configured = True
+
+
+def create_embeddings(backend: str, fake_dim: int = 768, fake_latency: float = 0.0) -> Any:
+    _check_backend(backend)
+    if backend == "fake":
+        try:
+            from .fake_models import HashingEmbeddings
+        except ImportError:  # running from inside pdf_extraction/src (uvicorn chat_with_pdf:app)
+            from fake_models import HashingEmbeddings
+        return HashingEmbeddings(dim=fake_dim, latency=fake_latency)
+    _configure_google()
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL)
+
+
+def create_chat_model(
+    backend: str, fake_latency: float = 0.5, fake_words_per_second: float = 0.0, temperature: float = 0.3
+) -> Any:
+    _check_backend(backend)
+    if backend == "fake":
+        try:
+            from .fake_models import FakeChatModel
+        except ImportError:  # running from inside pdf_extraction/src (uvicorn chat_with_pdf:app)
+            from fake_models import FakeChatModel
+        return FakeChatModel(latency=fake_latency, words_per_second=fake_words_per_second)
+    _configure_google()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=GOOGLE_CHAT_MODEL, temperature=temperature)
@@ -0,0 +1,166 @@
+"""
+OCR fallback for pages without a text layer
+
+Scanned PDFs, and scanned pages inside otherwise digital PDFs, give no text with
+PyPDF2. ``OcrMerger`` watches the page texts as they stream out of the PyPDF2
+extractor. It collects the pages that came back (nearly) empty into small
+batches and hands them to ``ocr_pages``, which copies just those pages into a
+new PDF and runs MinerU's pipeline on it with ``parse_method="ocr"``. The
+recognised text replaces the empty pages, and pages are still yielded in
+document order. A mixed document pays OCR cost only for its scanned pages,
+and digital pages never pass through MinerU.
+
+``ocr_pages`` runs in pool worker processes, so MinerU and its models are loaded
+there once per worker and never in the API process. MinerU and pypdfium2 are
+imported inside it, so importing this module loads neither.
+"""
+
+import importlib.util
+import io
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Tuple
+
+try:
+    from .mineru_output import iter_content_blocks
+except ImportError:  # running from inside pdf_extraction/src (uvicorn chat_with_pdf:app)
+    from mineru_output import iter_content_blocks
+
+
+def ocr_available() -> bool:
+    """Whether MinerU and pypdfium2 are installed, checked without importing them."""
+    return all(importlib.util.find_spec(name) is not None for name in ("mineru", "pypdfium2"))
+
+
+def ocr_pages(path: str, page_indices: List[int], lang: str = "en") -> Tuple[Dict[int, str], float]:
+    """OCR pages ``page_indices`` (0-based) of the PDF at ``path``; runs inside pool workers.
+
+    Returns ``({page_index: text}, seconds)``. A page on which MinerU found
+    nothing maps to an empty string.
+    """
+    import pypdfium2 as pdfium
+    from mineru.backend.pipeline.model_json_to_middle_json import result_to_middle_json
+    from mineru.backend.pipeline.pipeline_analyze import doc_analyze
+    from mineru.backend.pipeline.pipeline_middle_json_mkcontent import union_make
+    from mineru.data.data_reader_writer import FileBasedDataWriter
+    from mineru.utils.enum_class import MakeMode
+
+    started = time.perf_counter()
+    # Only the selected pages are rendered and run through the layout and OCR models
+    source = pdfium.PdfDocument(path)
+    subset = pdfium.PdfDocument.new()
+    try:
+        subset.import_pages(source, pages=page_indices)
+        buffer = io.BytesIO()
+        subset.save(buffer)
+    finally:
+        subset.close()
+        source.close()
+
+    infer_results, image_lists, pdf_docs, langs, ocr_enabled = doc_analyze(
+        [buffer.getvalue()], [lang], parse_method="ocr", formula_enable=False, table_enable=True
+    )
+    # Cropped figures are written to the image directory; only the text is kept
+    with tempfile.TemporaryDirectory() as image_dir:
+        middle_json = result_to_middle_json(
+            infer_results[0], image_lists[0], pdf_docs[0], FileBasedDataWriter(image_dir),
+            langs[0], ocr_enabled[0], False,
+        )
+        content_list = union_make(middle_json["pdf_info"], MakeMode.CONTENT_LIST, "images")
+
+    parts: Dict[int, List[str]] = {index: [] for index in page_indices}
+    for _, text, page in iter_content_blocks(content_list):
+        if 0 < page <= len(page_indices):
+            parts[page_indices[page - 1]].append(text)
+    return {index: "\n\n".join(texts) for index, texts in parts.items()}, time.perf_counter() - started
+
+
+class OcrMerger:
+    """Replaces the text of pages without a text layer with OCR output, keeping page order.
+
+    ``submit(page_indices)`` must start OCR of those pages and return a future of
+    ``ocr_pages``' result. From the first page awaiting OCR onwards, pages are
+    held back until their turn comes. Holding stops at ``max_held_pages``: the
+    open batch is then sent off and the head page waited for. At most
+    ``max_batches_in_flight`` batches are outstanding. A failed batch leaves its
+    pages empty and is recorded in ``errors``, so the rest of the document is
+    still ingested.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[List[int]], Future],
+        min_chars: int = 1,
+        pages_per_batch: int = 8,
+        max_batches_in_flight: int = 2,
+        max_held_pages: int = 64,
+    ):
+        self.submit = submit
+        self.min_chars = min_chars
+        self.pages_per_batch = pages_per_batch
+        self.max_batches_in_flight = max_batches_in_flight
+        self.max_held_pages = max(max_held_pages, pages_per_batch)
+        self.ocr_pages = 0
+        self.ocr_seconds = 0.0
+        self.errors: List[str] = []
+
+    def needs_ocr(self, text: str) -> bool:
+        return len(text.strip()) < self.min_chars
+
+    def pages(self, texts: Iterable[str]) -> Iterator[str]:
+        held: Deque[int] = deque()
+        ready: Dict[int, str] = {}
+        batch: List[int] = []
+        in_flight: Deque[Tuple[Future, List[int]]] = deque()
+
+        def send_batch() -> None:
+            if batch:
+                in_flight.append((self.submit(list(batch)), list(batch)))
+                batch.clear()
+
+        def collect() -> None:
+            future, indices = in_flight.popleft()
+            try:
+                page_texts, seconds = future.result()
+                self.ocr_pages += len(indices)
+                self.ocr_seconds += seconds
+            except Exception as e:
+                self.errors.append(f"pages {', '.join(str(index + 1) for index in indices)}: {e}")
+                page_texts = {}
+            for index in indices:
+                ready[index] = page_texts.get(index, "")
+
+        try:
+            for index, text in enumerate(texts):
+                if self.needs_ocr(text):
+                    held.append(index)
+                    batch.append(index)
+                    if len(batch) >= self.pages_per_batch:
+                        send_batch()
+                    while len(in_flight) > self.max_batches_in_flight:
+                        collect()
+                elif held:
+                    held.append(index)
+                    ready[index] = text
+                else:
+                    yield text
+                    continue
+                while in_flight and in_flight[0][0].done():
+                    collect()
+                if len(held) >= self.max_held_pages and held[0] not in ready:
+                    send_batch()
+                    while held[0] not in ready:
+                        collect()
+                while held and held[0] in ready:
+                    yield ready.pop(held.popleft())
+            send_batch()
+            while held:
+                if held[0] not in ready:
+                    collect()
+                    continue
+                yield ready.pop(held.popleft())
+        finally:
+            for future, _ in in_flight:
+                future.cancel()
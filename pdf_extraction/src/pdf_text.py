@@ -0,0 +1,186 @@
+"""
+Streaming PDF text extraction
+
+Uploads are spooled to a temporary file in fixed-size blocks, pages are read
+lazily from that file one at a time, and text is cut into chunks as pages
+arrive. Peak memory is bounded by one block, one page and a couple of chunks
+rather than by the size of the document.
+
+PyPDF2 is imported by the functions that read PDFs, so the spooling helpers the
+upload endpoint needs do not load it.
+"""
+
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+def spool_to_file(stream: BinaryIO, suffix: str = ".pdf", block_size: int = SPOOL_BLOCK_SIZE, hasher=None) -> Path:
+    """Copy ``stream`` to a new temporary file block by block; the caller removes it.
+
+    Blocks are also fed to ``hasher`` (e.g. ``hashlib.sha256()``) if given, so
+    the content hash costs no extra read.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        try:
+            while True:
+                block = stream.read(block_size)
+                if not block:
+                    break
+                tmp.write(block)
+                if hasher is not None:
+                    hasher.update(block)
+        except BaseException:
+            tmp.close()
+            remove_quietly(Path(tmp.name))
+            raise
+        return Path(tmp.name)
+
+
+def remove_quietly(path: Path) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def spool_upload(stream: BinaryIO, suffix: str = ".pdf", block_size: int = SPOOL_BLOCK_SIZE) -> Iterator[Path]:
+    """Copy ``stream`` to a temporary file block by block and yield its path."""
+    path = spool_to_file(stream, suffix=suffix, block_size=block_size)
+    try:
+        yield path
+    finally:
+        remove_quietly(path)
+
+
+def iter_pdf_pages(path: Path) -> Iterator[str]:
+    """Yield the text of each page of the PDF at ``path`` in order."""
+    from PyPDF2 import PdfReader
+
+    # Passing an open file (not a path) keeps PyPDF2 from reading the whole file into memory
+    with open(path, "rb") as fh:
+        reader = PdfReader(fh)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+
+
+def count_pdf_pages(path: Path) -> int:
+    from PyPDF2 import PdfReader
+
+    with open(path, "rb") as fh:
+        return len(PdfReader(fh).pages)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Return the text of pages ``start``..``stop - 1``; runs inside pool workers."""
+    from PyPDF2 import PdfReader
+
+    with open(path, "rb") as fh:
+        reader = PdfReader(fh)
+        return [(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def iter_pdf_pages_parallel(
+    path: Path,
+    pool: Optional[Executor],
+    workers: int,
+    pages_per_shard: int = 8,
+    min_pages: int = 32,
+) -> Iterator[str]:
+    """Yield page texts in order while page ranges are extracted on ``pool``.
+
+    Documents shorter than ``min_pages`` are read in-process, where the cost of
+    shipping work to another process would outweigh the parallel speed-up. At
+    most ``2 * workers`` shards are in flight so finished pages do not pile up
+    ahead of the consumer.
+    """
+    page_count = count_pdf_pages(path)
+    if pool is None or workers < 2 or page_count < min_pages:
+        yield from iter_pdf_pages(path)
+        return
+
+    shards = iter(range(0, page_count, pages_per_shard))
+    pending: deque = deque()
+
+    def submit_next() -> None:
+        start = next(shards, None)
+        if start is not None:
+            stop = min(start + pages_per_shard, page_count)
+            pending.append(pool.submit(extract_page_range, str(path), start, stop))
+
+    for _ in range(workers * 2):
+        submit_next()
+    try:
+        while pending:
+            pages = pending.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class IncrementalChunker:
+    """Feeds text through a splitter in bounded pieces instead of all at once.
+
+    Text is buffered until it holds a few chunks' worth, then split; every chunk
+    except the last is emitted and the last one stays in the buffer so the
+    splitter can keep extending it (and overlapping with it) as more text arrives.
+    """
+
+    def __init__(self, splitter, chunk_size: int):
+        self.splitter = splitter
+        self.flush_at = chunk_size * 2
+        self._buffer: List[str] = []
+        self._buffered = 0
+
+    def feed(self, text: str) -> List[str]:
+        if not text:
+            return []
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered < self.flush_at:
+            return []
+        text = "".join(self._buffer)
+        chunks = self.splitter.split_text(text)
+        if len(chunks) < 2:
+            return []
+        tail = self._raw_tail(text, chunks[-1])
+        self._buffer = [tail]
+        self._buffered = len(tail)
+        return chunks[:-1]
+
+    @staticmethod
+    def _raw_tail(text: str, tail: str) -> str:
+        """The buffered text from where chunk ``tail`` starts, whitespace included.
+
+        Splitters strip their chunks, so keeping ``tail`` itself would drop the
+        separator after it and glue the next page's first word onto its last one.
+        """
+        start = len(text.rstrip()) - len(tail)
+        if start < 0 or text[start:start + len(tail)] != tail:
+            start = text.rfind(tail)
+        if start < 0:
+            return tail + text[len(text.rstrip()):]
+        return text[start:]
+
+    def flush(self) -> List[str]:
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        return self.splitter.split_text(text) if text.strip() else []
+
+
+def iter_text_chunks(pages: Iterable[str], splitter, chunk_size: int) -> Iterator[str]:
+    """Yield chunks of ``pages`` as soon as enough text has arrived to cut them."""
+    chunker = IncrementalChunker(splitter, chunk_size)
+    for page_text in pages:
+        yield from chunker.feed(page_text + "\n")
+    yield from chunker.flush()
@@ -23,6 +23,11 @@ from mineru.backend.pipeline.model_json_to_middle_json import result_to_middle_j
 from mineru.backend.vlm.vlm_middle_json_mkcontent import union_make as vlm_union_make
 from mineru.utils.models_download_utils import auto_download_and_get_model_root_path
 
+try:
+    from .mineru_output import file_sha256, find_output, register_output
+except ImportError:  # run as a script from inside pdf_extraction/src
+    from mineru_output import file_sha256, find_output, register_output
+
 
 def do_parse(
     output_dir,  # Output directory for storing parsing results
@@ -44,8 +49,14 @@ def do_parse(
     f_make_md_mode=MakeMode.MM_MD,  # The mode for making markdown content, default is MM_MD
     start_page_id=0,  # Start page ID for parsing, default is 0
     end_page_id=None,  # End page ID for parsing, default is None (parse all pages until the end of the document)
+    pdf_sha256_list=None,  # sha256 of each source file; registers whole-document output so the chat API can reuse it
 ):
 
+    # Only output covering every page may stand in for the document in the chat API
+    register = bool(pdf_sha256_list) and start_page_id == 0 and end_page_id is None
+    if pdf_sha256_list and not register:
+        logger.info("parsing a page range; the output is not registered for reuse by the chat API")
+
     if backend == "pipeline":
         for idx, pdf_bytes in enumerate(pdf_bytes_list):
             new_pdf_bytes = convert_pdf_bytes_to_bytes_by_pypdfium2(pdf_bytes, start_page_id, end_page_id)
@@ -96,6 +107,9 @@ def do_parse(
                     json.dumps(content_list, ensure_ascii=False, indent=4),
                 )
 
+            if register:
+                register_output(output_dir, pdf_sha256_list[idx], pdf_file_name, Path(local_md_dir))
+
             if f_dump_middle_json:
                 md_writer.write_string(
                     f"{pdf_file_name}_middle.json",
@@ -152,6 +166,9 @@ def do_parse(
                     json.dumps(content_list, ensure_ascii=False, indent=4),
                 )
 
+            if register:
+                register_output(output_dir, pdf_sha256_list[idx], pdf_file_name, Path(local_md_dir))
+
             if f_dump_middle_json:
                 md_writer.write_string(
                     f"{pdf_file_name}_middle.json",
@@ -203,12 +220,14 @@ def parse_doc(
         file_name_list = []
         pdf_bytes_list = []
         lang_list = []
+        sha256_list = []
         for path in path_list:
             file_name = str(Path(path).stem)
             pdf_bytes = read_fn(path)
             file_name_list.append(file_name)
             pdf_bytes_list.append(pdf_bytes)
             lang_list.append(lang)
+            sha256_list.append(file_sha256(path))
         do_parse(
             output_dir=output_dir,
             pdf_file_names=file_name_list,
@@ -218,7 +237,8 @@ def parse_doc(
             parse_method=method,
             server_url=server_url,
             start_page_id=start_page_id,
-            end_page_id=end_page_id
+            end_page_id=end_page_id,
+            pdf_sha256_list=sha256_list,
         )
     except Exception as e:
         logger.exception(e)
@@ -235,6 +255,10 @@ if __name__ == '__main__':
     doc_path_list = []
     for doc_path in Path(pdf_files_dir).glob('*'):
         if doc_path.suffix in pdf_suffixes + image_suffixes:
+            # Each file is parsed once; its registered output is reused by the chat API
+            if find_output(output_dir, file_sha256(doc_path)) is not None:
+                logger.info(f"skipping {doc_path.name}, already parsed")
+                continue
             doc_path_list.append(doc_path)
 
     parse_doc(doc_path_list, output_dir, backend="pipeline")
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+Session catalog
+
+One indexed SQLite table describing every session, so listing, paging, sorting
+and filtering sessions never touches the per-session directories. Ingestion and
+deletion update it in a transaction; each row also keeps the full session.json
+payload so single-session lookups are served from the catalog too. A catalog
+created next to existing sessions is backfilled once from their session.json
+files.
+
+Rows also track when a session was last used and how many bytes it occupies on
+disk, which the background sweeper uses for TTL expiry and quota eviction.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SORT_COLUMNS = ("created_at", "updated_at", "document_count", "chunk_count")
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SessionCatalog:
+    """SQLite-backed index of session summaries shared by all worker processes."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " created_at TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL,"
+            " document_count INTEGER NOT NULL,"
+            " chunk_count INTEGER NOT NULL,"
+            " document_names TEXT NOT NULL,"
+            " info TEXT NOT NULL,"
+            " last_accessed REAL,"
+            " size_bytes INTEGER)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "last_accessed" not in columns:
+            # Catalogs created before access tracking: start from the last update time
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN last_accessed REAL")
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN size_bytes INTEGER")
+            self._conn.execute("UPDATE sessions SET last_accessed = CAST(strftime('%s', updated_at) AS REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_accessed ON sessions (last_accessed)")
+        for column in SORT_COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS sessions_{column} ON sessions ({column})")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+        # Last access time written per session, to rate-limit touch() writes
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def _row(session_id: str, info: Dict[str, Any]) -> Tuple:
+        documents = info.get("documents", [])
+        created_at = info.get("created_at") or ""
+        return (
+            session_id,
+            created_at,
+            info.get("updated_at") or created_at,
+            len(documents),
+            info.get("chunk_count", 0),
+            # Lowercased once here so name filters are a plain LIKE
+            "\n".join(doc.get("name", "") for doc in documents).lower(),
+            json.dumps(info),
+        )
+
+    def upsert(self, session_id: str, info: Dict[str, Any], size_bytes: Optional[int] = None) -> None:
+        """Insert or replace a session's row; an update counts as an access."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions"
+                    " (session_id, created_at, updated_at, document_count, chunk_count, document_names, info,"
+                    " last_accessed, size_bytes)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (*self._row(session_id, info), now, size_bytes),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; returns whether it was in the catalog."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._touched.pop(session_id, None)
+        return deleted > 0
+
+    def touch(self, session_id: str, min_interval: float = 60.0) -> None:
+        """Record an access; writes at most once per ``min_interval`` seconds per session and process."""
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(session_id, 0.0) < min_interval:
+                return
+            self._touched[session_id] = now
+            self._conn.execute("UPDATE sessions SET last_accessed = ? WHERE session_id = ?", (now, session_id))
+
+    def last_accessed(self, session_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_accessed FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set_size(self, session_id: str, size_bytes: int) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE sessions SET size_bytes = ? WHERE session_id = ?", (size_bytes, session_id))
+
+    def unsized(self) -> List[str]:
+        """Sessions whose disk usage has not been measured yet (backfilled or migrated rows)."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT session_id FROM sessions WHERE size_bytes IS NULL")]
+
+    def accessed_before(self, cutoff: float) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id FROM sessions WHERE last_accessed < ? ORDER BY last_accessed", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def least_recently_used(self) -> List[Tuple[str, int]]:
+        """All sessions as ``(session_id, size_bytes)``, least recently accessed first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, COALESCE(size_bytes, 0) FROM sessions ORDER BY last_accessed, session_id"
+            ).fetchall()
+        return [(session_id, size) for session_id, size in rows]
+
+    def most_recently_used(self, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id FROM sessions ORDER BY last_accessed DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def usage(self) -> Tuple[int, int]:
+        """Return ``(session count, total measured bytes)``."""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM sessions").fetchone()
+        return count, total
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT info FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def list(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        sort: str = "created_at",
+        order: str = "desc",
+        name: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Return one page of session summaries and the total number matching the filters.
+
+        ``name`` matches any document name containing it (case-insensitive);
+        ``created_after``/``created_before`` are ISO timestamps, compared as text.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+
+        clauses, params = [], []
+        if name:
+            clauses.append("document_names LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(name.lower())}%")
+        if created_after:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM sessions{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT session_id, created_at, updated_at, document_count, chunk_count FROM sessions"
+                f"{where} ORDER BY {sort} {order}, session_id {order} LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+        sessions = [
+            {
+                "session_id": session_id,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "document_count": document_count,
+                "chunk_count": chunk_count,
+            }
+            for session_id, created_at, updated_at, document_count, chunk_count in rows
+        ]
+        return sessions, total
+
+    def backfill(self, session_dir: Path) -> int:
+        """Import session.json files the first time the catalog is used; returns the number imported."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM catalog_meta WHERE key = 'backfilled'").fetchone():
+                    self._conn.execute("COMMIT")
+                    return 0
+                imported = 0
+                for session_file in Path(session_dir).glob("*/session.json"):
+                    try:
+                        with open(session_file, "r") as f:
+                            info = json.load(f)
+                        modified = session_file.stat().st_mtime
+                    except (OSError, ValueError):
+                        continue
+                    # Sizes are left NULL for the sweeper to measure
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO sessions"
+                        " (session_id, created_at, updated_at, document_count, chunk_count, document_names, info,"
+                        " last_accessed)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (*self._row(session_file.parent.name, info), modified),
+                    )
+                    imported += 1
+                self._conn.execute("INSERT INTO catalog_meta (key, value) VALUES ('backfilled', '1')")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return imported
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM catalog_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,135 @@
+"""
+Session garbage collection
+
+A sweeper that runs periodically in the background and reclaims disk space
+from sessions. Sessions not accessed within the TTL are removed, and while the
+total size of all sessions exceeds the quota the least recently used ones are
+evicted. Candidates come from the session catalog, so a sweep never scans the
+session directory. The quota also counts bytes held outside the session
+directories, such as the shared document store, so it bounds the disk use of
+everything sessions keep. The actual removal is delegated to a callback that takes
+the session write lock and re-checks the access time, so a session that is
+being written to or was just used is never removed.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+try:
+    from .session_catalog import SessionCatalog
+except ImportError:  # running from inside pdf_extraction/src (uvicorn chat_with_pdf:app)
+    from session_catalog import SessionCatalog
+
+
+def directory_size(path: Path) -> int:
+    """Total size in bytes of the regular files under ``path``."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class SessionSweeper:
+    """Applies the session TTL and disk quota; counts what it reclaimed.
+
+    ``remove(session_id, accessed_before)`` deletes the session unless it was
+    accessed at or after ``accessed_before`` and returns the bytes freed, or
+    None if it kept or could not find the session. ``shared_bytes()`` returns
+    the bytes of shared data that sessions reference (counted towards the
+    quota); what a removal frees of it is part of ``remove``'s result.
+    """
+
+    def __init__(
+        self,
+        catalog: SessionCatalog,
+        session_dir: Path,
+        remove: Callable[[str, float], Optional[int]],
+        ttl_seconds: float = 0,
+        quota_bytes: int = 0,
+        shared_bytes: Optional[Callable[[], int]] = None,
+    ):
+        self.catalog = catalog
+        self.session_dir = Path(session_dir)
+        self.remove = remove
+        # 0 disables the TTL / the quota
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self.shared_bytes = shared_bytes or (lambda: 0)
+        self._lock = threading.Lock()
+        self.sweeps = 0
+        self.expired = 0
+        self.quota_evictions = 0
+        self.bytes_reclaimed = 0
+        self.last_sweep_at: Optional[float] = None
+        self.last_sweep_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def sweep(self) -> Dict[str, int]:
+        """Run one pass; returns what this pass removed. Safe to call from any thread."""
+        with self._lock:
+            started = time.monotonic()
+            expired = evicted = reclaimed = 0
+            try:
+                # Rows imported from session.json files or older catalogs have no size yet
+                for session_id in self.catalog.unsized():
+                    self.catalog.set_size(session_id, directory_size(self.session_dir / session_id))
+
+                now = time.time()
+                if self.ttl_seconds > 0:
+                    cutoff = now - self.ttl_seconds
+                    for session_id in self.catalog.accessed_before(cutoff):
+                        freed = self.remove(session_id, cutoff)
+                        if freed is not None:
+                            expired += 1
+                            reclaimed += freed
+
+                if self.quota_bytes > 0:
+                    _, total = self.catalog.usage()
+                    total += self.shared_bytes()
+                    for session_id, _ in self.catalog.least_recently_used():
+                        if total <= self.quota_bytes:
+                            break
+                        # Sessions used since this sweep started are not eviction candidates
+                        freed = self.remove(session_id, now)
+                        if freed is not None:
+                            evicted += 1
+                            reclaimed += freed
+                            total -= freed
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                self.sweeps += 1
+                self.expired += expired
+                self.quota_evictions += evicted
+                self.bytes_reclaimed += reclaimed
+                self.last_sweep_at = time.time()
+                self.last_sweep_seconds = round(time.monotonic() - started, 3)
+        return {"expired": expired, "quota_evictions": evicted, "bytes_reclaimed": reclaimed}
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        session_count, session_bytes = self.catalog.usage()
+        shared_bytes = self.shared_bytes()
+        return {
+            "sessions": session_count,
+            "bytes": session_bytes + shared_bytes,
+            "session_bytes": session_bytes,
+            "shared_bytes": shared_bytes,
+            "quota_bytes": self.quota_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "sweeps": self.sweeps,
+            "expired": self.expired,
+            "quota_evictions": self.quota_evictions,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": self.last_sweep_seconds,
+            "last_error": self.last_error,
+        }
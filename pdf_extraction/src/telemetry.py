@@ -0,0 +1,209 @@
+"""
+Stage timings, Prometheus metrics and sampled structured logs
+
+Each pipeline stage (upload spooling, PDF parsing, chunking, embedding, index
+save/load, similarity search, LLM generation) is timed with ``stage()``. A
+duration goes to a per-stage histogram, which ``render()`` exposes in the
+Prometheus text format. It also goes to the current request's timing record,
+which the HTTP middleware turns into ``Server-Timing`` response headers.
+
+Metrics are per worker process. The request's timing record lives in a
+context variable, so work handed to thread pools must carry the caller's
+context: ``run_in_threadpool`` does so, and for plain executors use
+``submit_in_context`` / ``in_context``.
+
+Hot-path logs go through ``log_sampled``, which emits only a configurable
+fraction of events. ``log_event`` always emits. Both write loguru records with
+the fields bound, and JSON lines when ``serialize`` is enabled.
+"""
+
+import bisect
+import contextvars
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+# Seconds; covers sub-millisecond cache lookups up to multi-minute ingestions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            # Per-bucket counts (last slot is +Inf), then sum and count
+            series = self._series.setdefault(labels, [0.0] * (len(self.buckets) + 3))
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _labels(self.label_names, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]:g}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, labels)} {value:g}" for labels, value in items)
+        return lines
+
+
+STAGE_SECONDS = Histogram("pdf_chat_stage_seconds", "Time spent in each pipeline stage", ("stage",))
+STAGE_ITEMS = Counter("pdf_chat_stage_items_total", "Items processed per stage (pages, chunks, bytes, questions)", ("stage", "unit"))
+HTTP_SECONDS = Histogram("pdf_chat_http_request_seconds", "HTTP request latency until the response starts", ("method", "route", "status"))
+
+# Extra exporters added by the app, e.g. cache statistics rendered as gauges
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def add_collector(collector: Callable[[], List[str]]) -> None:
+    _collectors.append(collector)
+
+
+def gauge_lines(name: str, help_text: str, values: Dict[Tuple[Tuple[str, str], ...], float]) -> List[str]:
+    """Render a gauge family from ``{((label, value), ...): number}``."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in values.items():
+        names = tuple(label for label, _ in labels)
+        label_values = tuple(str(label_value) for _, label_value in labels)
+        lines.append(f"{name}{_labels(names, label_values)} {float(value):g}")
+    return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in (STAGE_SECONDS, STAGE_ITEMS, HTTP_SECONDS):
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            log_event("metrics_collector_failed", error=str(e))
+    return "\n".join(lines) + "\n"
+
+
+def record(stage: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere."""
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def count(stage: str, amount: float, unit: str) -> None:
+    STAGE_ITEMS.inc(amount, stage, unit)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as pipeline stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+@contextmanager
+def request_timings() -> Iterator[Dict[str, float]]:
+    """Collect the stage timings of one request; used by the HTTP middleware."""
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def in_context(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Bind ``func`` to a copy of the current context, for ``loop.run_in_executor``."""
+    context = contextvars.copy_context()
+    return lambda *args: context.run(func, *args)
+
+
+def submit_in_context(executor: Executor, func: Callable[..., Any], *args: Any) -> Future:
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+_sample_rate = 1.0
+
+
+def configure_logging(sample_rate: float = 0.1, serialize: bool = False, level: str = "INFO") -> None:
+    """Set the fraction of sampled events to keep and whether log lines are JSON."""
+    global _sample_rate
+    _sample_rate = max(0.0, min(1.0, sample_rate))
+    logger.remove()
+    logger.add(sys.stderr, level=level, serialize=serialize)
+
+
+def log_event(event: str, level: str = "INFO", **fields: Any) -> None:
+    logger.bind(event=event, **fields).log(level, "{} {}", event, fields)
+
+
+def log_sampled(event: str, **fields: Any) -> None:
+    """Log a hot-path event for only ``sample_rate`` of calls."""
+    if _sample_rate >= 1.0 or random.random() < _sample_rate:
+        log_event(event, sampled=True, **fields)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules under test import their siblings the way uvicorn runs them, from inside src
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
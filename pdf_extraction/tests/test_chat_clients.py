@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+for module in ("fastapi", "numpy", "dotenv", "loguru", "langchain"):
+    pytest.importorskip(module)
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# Runs in a fresh interpreter so no client has been built yet, as on a worker's first request
+COLD_CHAIN = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import chat_with_pdf
+chain = chat_with_pdf.get_conversational_chain()
+assert chain is chat_with_pdf.get_conversational_chain()
+assert chat_with_pdf._chat_model is not None
+"""
+
+
+def test_conversational_chain_builds_on_cold_process_without_warm_up(tmp_path):
+    env = dict(
+        os.environ,
+        PDF_CHAT_WARMUP="off",
+        PDF_CHAT_EMBEDDING_BACKEND="fake",
+        PDF_CHAT_LLM_BACKEND="fake",
+        PDF_CHAT_SESSION_SWEEP_SECONDS="0",
+    )
+    # A deadlock shows up as a timeout instead of a hung test run
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_CHAIN, str(SRC_DIR)],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
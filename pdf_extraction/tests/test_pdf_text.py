@@ -0,0 +1,37 @@
+import pytest
+
+from pdf_text import IncrementalChunker, iter_text_chunks
+
+try:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+except ImportError:
+    RecursiveCharacterTextSplitter = pytest.importorskip("langchain.text_splitter").RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+
+def make_pages(count=60, words_per_page=120):
+    return [" ".join(f"w{page}_{word}" for word in range(words_per_page)) for page in range(count)]
+
+
+def test_every_word_survives_chunking():
+    pages = make_pages()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    chunks = list(iter_text_chunks(pages, splitter, CHUNK_SIZE))
+
+    chunked_words = {word for chunk in chunks for word in chunk.split()}
+    expected_words = {word for page in pages for word in page.split()}
+    assert chunked_words == expected_words
+
+
+def test_page_boundary_keeps_separator():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunker = IncrementalChunker(splitter, CHUNK_SIZE)
+    chunks = []
+    for page in make_pages(count=10):
+        chunks.extend(chunker.feed(page + "\n"))
+    chunks.extend(chunker.flush())
+
+    assert not any(word.count("_") > 1 for chunk in chunks for word in chunk.split())
@@ -1,14 +1,106 @@
 #!/usr/bin/env python3
 """
 FastAPI PDF Chat Server Startup Script
+
+Development (default): one process with auto-reload.
+Production (--production): several worker processes (CPU count by default), no
+reload, each worker warmed up before it accepts requests, and a graceful drain
+on SIGTERM: in-flight requests and running ingestion jobs get
+--graceful-timeout seconds to finish.
 """
 
+import argparse
 import os
+import signal
 import sys
 import subprocess
+import time
+from importlib.util import find_spec
 from pathlib import Path
 
+# pip package name -> module it installs; only located during preflight, never imported,
+# so the launcher does not load what the server process loads again
+REQUIRED_PACKAGES = {
+    "fastapi": "fastapi",
+    "uvicorn": "uvicorn",
+    "python-multipart": "multipart",
+    "PyPDF2": "PyPDF2",
+    "python-pptx": "pptx",
+    "langchain": "langchain",
+    "langchain-community": "langchain_community",
+    "python-dotenv": "dotenv",
+    "faiss-cpu": "faiss",
+    "numpy": "numpy",
+    "loguru": "loguru",
+}
+GOOGLE_PACKAGES = {
+    "langchain-google-genai": "langchain_google_genai",
+    "google-generativeai": "google.generativeai",
+}
+
+def is_installed(module: str) -> bool:
+    try:
+        return find_spec(module) is not None
+    except (ImportError, ValueError):  # parent package of a dotted name missing
+        return False
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the PDF Chat API server")
+    parser.add_argument("--production", action="store_true",
+                        default=os.getenv("PDF_CHAT_PRODUCTION", "0") == "1",
+                        help="Multi-worker mode without auto-reload (env PDF_CHAT_PRODUCTION=1)")
+    parser.add_argument("--host", default=os.getenv("PDF_CHAT_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PDF_CHAT_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("PDF_CHAT_WORKERS", "0")),
+                        help="Worker processes in production mode (default: CPU count)")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("PDF_CHAT_KEEP_ALIVE", "75")),
+                        help="Seconds an idle keep-alive connection stays open in production mode; keep it above "
+                             "the idle timeout of the load balancer in front")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("PDF_CHAT_BACKLOG", "2048")),
+                        help="Pending connections the listening socket queues")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("PDF_CHAT_GRACEFUL_TIMEOUT", "30")),
+                        help="Seconds to drain in-flight requests and ingestion jobs on shutdown")
+    parser.add_argument("--preload-sessions", type=int, default=int(os.getenv("PDF_CHAT_PRELOAD_SESSIONS", "16")),
+                        help="Most recently used session indexes each worker loads before serving in production mode")
+    return parser.parse_args()
+
+# Function to build the uvicorn command line and the environment of the server processes
+def server_command(args):
+    cmd = [
+        sys.executable, "-m", "uvicorn",
+        "pdf_extraction.src.chat_with_pdf:app",
+        "--host", args.host,
+        "--port", str(args.port),
+        "--backlog", str(args.backlog),
+    ]
+    env = dict(os.environ)
+    env.setdefault("PDF_CHAT_DRAIN_SECONDS", str(args.graceful_timeout))
+    if not args.production:
+        cmd.append("--reload")
+        return cmd, env
+
+    workers = args.workers or os.cpu_count() or 1
+    cmd += [
+        "--workers", str(workers),
+        "--timeout-keep-alive", str(args.keep_alive),
+        "--timeout-graceful-shutdown", str(args.graceful_timeout),
+    ]
+    # Each worker builds its clients and maps the most recently used session indexes
+    # before accepting requests, so none is routed traffic while still loading
+    env.setdefault("PDF_CHAT_WARMUP", "blocking")
+    env["PDF_CHAT_PRELOAD_SESSIONS"] = str(args.preload_sessions)
+    # Every worker has its own PDF extraction pool; split the cores between them
+    env.setdefault("PDF_CHAT_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    # The embedding quota is enforced per process but configured for the whole server, so each
+    # worker gets its share (the ingestion limit is shared through lock files and needs no split)
+    requests_per_minute = float(os.getenv("PDF_CHAT_EMBED_REQUESTS_PER_MINUTE", "0"))
+    if requests_per_minute > 0:
+        env["PDF_CHAT_EMBED_REQUESTS_PER_MINUTE"] = str(requests_per_minute / workers)
+    return cmd, env
+
 def main():
+    args = parse_args()
+    preflight_started = time.perf_counter()
     # Get the directory where this script is located
     script_dir = Path(__file__).parent
     pdf_api_path = script_dir / "pdf_extraction" / "src" / "chat_with_pdf.py"
@@ -19,8 +111,11 @@ def main():
         print("Please ensure the pdf_extraction directory structure is correct.")
         sys.exit(1)
     
-    # Check if GOOGLE_API_KEY is set
-    if not os.getenv("GOOGLE_API_KEY"):
+    # Check if GOOGLE_API_KEY is set (not needed when both model backends are the local fakes)
+    uses_google = "google" in (
+        os.getenv("PDF_CHAT_EMBEDDING_BACKEND", "google"), os.getenv("PDF_CHAT_LLM_BACKEND", "google")
+    )
+    if uses_google and not os.getenv("GOOGLE_API_KEY"):
         print("Error: GOOGLE_API_KEY environment variable is not set.")
         print("Please set your Google API key:")
         print("  Windows: set GOOGLE_API_KEY=your_api_key_here")
@@ -28,58 +123,53 @@ def main():
         sys.exit(1)
     
     # Check if required packages are installed
-    required_packages = [
-        "fastapi",
-        "uvicorn",
-        "PyPDF2",
-        "python-pptx",
-        "langchain",
-        "langchain-google-genai",
-        "python-dotenv",
-        "faiss-cpu"
-    ]
-    
+    required_packages = dict(REQUIRED_PACKAGES)
+    if uses_google:
+        required_packages.update(GOOGLE_PACKAGES)
+
     print("Checking required packages...")
-    missing_packages = []
-    
-    for package in required_packages:
-        try:
-            __import__(package.replace("-", "_"))
-        except ImportError:
-            missing_packages.append(package)
-    
+    missing_packages = [package for package, module in required_packages.items() if not is_installed(module)]
+
     if missing_packages:
         print(f"Error: Missing required packages: {', '.join(missing_packages)}")
         print("Please install them using:")
         print(f"  pip install {' '.join(missing_packages)}")
         sys.exit(1)
     
-    print("All required packages are installed.")
-    print("Starting FastAPI server...")
-    print("The server will be available at: http://localhost:8000")
-    print("API documentation will be available at: http://localhost:8000/docs")
+    print(f"All required packages are installed (preflight took {(time.perf_counter() - preflight_started) * 1000:.0f} ms).")
+    print("The server logs a 'startup' event with its import and time-to-ready durations.")
+    cmd, env = server_command(args)
+    if args.production:
+        print(f"Starting FastAPI server in production mode with {cmd[cmd.index('--workers') + 1]} workers...")
+    else:
+        print("Starting FastAPI server in development mode (auto-reload)...")
+    print(f"The server will be available at: http://localhost:{args.port}")
+    print(f"API documentation will be available at: http://localhost:{args.port}/docs")
     print("Press Ctrl+C to stop the server")
     print("-" * 50)
     
     try:
-        # Start the FastAPI server using uvicorn
-        cmd = [
-            sys.executable, "-m", "uvicorn",
-            "pdf_extraction.src.chat_with_pdf:app",
-            "--host", "0.0.0.0",
-            "--port", "8000",
-            "--reload"
-        ]
-        
         # Change to the script directory to ensure proper module loading
         os.chdir(script_dir)
-        subprocess.run(cmd)
-        
-    except KeyboardInterrupt:
-        print("\nServer stopped by user.")
+        server = subprocess.Popen(cmd, env=env)
     except Exception as e:
         print(f"Error starting server: {e}")
         sys.exit(1)
 
+    # SIGTERM (e.g. from a container runtime) is passed on so uvicorn drains gracefully.
+    # Ctrl+C already reaches the server through the terminal; forwarding it as well would
+    # count as a second interrupt and force an immediate exit.
+    def forward_sigterm(signum, frame):
+        if server.poll() is None:
+            server.send_signal(signum)
+    signal.signal(signal.SIGTERM, forward_sigterm)
+
+    try:
+        return_code = server.wait()
+    except KeyboardInterrupt:
+        print("\nServer stopped by user.")
+        return_code = server.wait()
+    sys.exit(return_code)
+
 if __name__ == "__main__":
     main()